@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Connection pool for get_db.
+"""
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+import threading
+import time
+
+from filtered_logger import get_db
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+class ConnectionPool:
+    """A bounded pool of reusable database connections.
+
+    Connections are created lazily up to ``size``, checked with a cheap
+    query when they are checked out, and closed once they have been idle
+    longer than ``max_idle`` seconds.
+    """
+
+    def __init__(self, connect: Callable = get_db, size: int = 5,
+                 timeout: float = 30.0, max_idle: float = 300.0,
+                 health_check: bool = True):
+        """
+        Initialize an empty pool.
+
+        Args:
+            connect (Callable): Opens a new DB-API connection.
+            size (int): Maximum number of open connections.
+            timeout (float): Seconds a checkout may wait for a connection;
+            None waits forever.
+            max_idle (float): Seconds after which an idle connection is
+            closed instead of reused.
+            health_check (bool): Ping connections on checkout.
+        """
+        if size < 1:
+            raise ValueError("pool size must be at least 1")
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check = health_check
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.created = 0
+        self.evicted = 0
+        self.failed_checks = 0
+
+    @staticmethod
+    def ping(conn) -> bool:
+        """
+        Check that a connection still answers a trivial query.
+
+        Returns:
+            bool: True if the connection is usable, False otherwise.
+        """
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, conn) -> None:
+        """Close a connection that leaves the pool."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self) -> list:
+        """Pop the connections idle for too long; call with the lock held."""
+        expired = []
+        deadline = time.monotonic() - self.max_idle
+        # the oldest connections sit at the left end of the deque
+        while self._idle and self._idle[0][1] < deadline:
+            expired.append(self._idle.popleft()[0])
+        self._open -= len(expired)
+        self.evicted += len(expired)
+        return expired
+
+    def acquire(self):
+        """
+        Check a connection out of the pool.
+
+        Returns:
+            A DB-API connection, to be given back with release().
+
+        Raises:
+            PoolTimeout: If the pool stays exhausted for timeout seconds.
+        """
+        start = time.monotonic()
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                expired = self._evict_idle()
+                while not self._idle and self._open >= self.size:
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+                    remaining = None
+                    if self.timeout is not None:
+                        remaining = self.timeout - (time.monotonic() - start)
+                        if remaining <= 0:
+                            self.wait_time += time.monotonic() - start
+                            raise PoolTimeout(
+                                "no connection available after {}s".format(
+                                    self.timeout))
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()[0]
+                else:
+                    self._open += 1
+            for stale in expired:
+                self._discard(stale)
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except Exception:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self.created += 1
+            elif self.health_check and not self.ping(conn):
+                self._discard(conn)
+                self._forget(failed_check=True)
+                continue
+            with self._cond:
+                self.checkouts += 1
+                if waited:
+                    self.wait_time += time.monotonic() - start
+            return conn
+
+    def _forget(self, failed_check: bool = False) -> None:
+        """Give back the slot of a connection that was never returned."""
+        with self._cond:
+            self._open -= 1
+            if failed_check:
+                self.failed_checks += 1
+            self._cond.notify()
+
+    def release(self, conn) -> None:
+        """
+        Return a checked out connection to the pool.
+
+        The connection is rolled back first, so a transaction left open
+        (by a block that raised, say) doesn't carry its uncommitted
+        changes and locks over to the next borrower; a connection that
+        fails to roll back is closed instead.
+
+        Args:
+            conn: A connection obtained from acquire().
+        """
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            self._forget()
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """
+        Check a connection out for the duration of a with block.
+
+        Yields:
+            A DB-API connection, returned to the pool on exit.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the pool counters.
+
+        Returns:
+            Dict[str, float]: Open and idle connections, checkouts, how
+            many checkouts had to wait and for how long in total,
+            connections created, evicted for idleness, and dropped after
+            a failed health check.
+        """
+        with self._cond:
+            return {
+                "open": self._open,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "created": self.created,
+                "evicted": self.evicted,
+                "failed_checks": self.failed_checks,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool(**options) -> ConnectionPool:
+    """
+    Return the process-wide pool of get_db connections.
+
+    Args:
+        **options: ConnectionPool arguments, used when the pool is first
+        created.
+
+    Returns:
+        ConnectionPool: The shared pool.
+
+    Raises:
+        ValueError: If the pool already exists with other options.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(get_db, **options)
+            return _pool
+        for name, value in options.items():
+            if getattr(_pool, name, None) != value:
+                raise ValueError(
+                    "the pool already exists with {}={!r}, not {!r}".format(
+                        name, getattr(_pool, name, None), value))
+        return _pool
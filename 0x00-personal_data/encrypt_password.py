@@ -1,19 +1,82 @@
 #!/usr/bin/env python3
 """Provides functions for hashing and validating passwords using bcrypt."""
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+import os
+import threading
+import time
 import bcrypt
 
 
-def hash_password(password: str) -> bytes:
+DEFAULT_ROUNDS = 12
+# calibration never lowers the cost below the bcrypt default
+MIN_ROUNDS = DEFAULT_ROUNDS
+MAX_ROUNDS = 16
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of operation latencies in fixed buckets."""
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self):
+        """
+        Initializes an empty histogram.
+        """
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Records one latency.
+
+        Args:
+            seconds: The measured latency in seconds.
+        """
+        index = bisect_left(self.BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the bucket counts.
+
+        Returns:
+            A dict mapping each "<=N ms" bucket, then ">N ms", to the
+            number of latencies that fell in it.
+        """
+        with self._lock:
+            counts = list(self._counts)
+        labels = ["<={}ms".format(b) for b in self.BUCKETS_MS]
+        labels.append(">{}ms".format(self.BUCKETS_MS[-1]))
+        return dict(zip(labels, counts))
+
+
+VERIFY_TIMINGS = LatencyHistogram()
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """
     Returns the salted and hashed password as a byte string.
 
     Args:
         password: A string representing the password to be hashed.
+        rounds: The bcrypt work factor (log2 of the iterations), defaults
+        to the cost calibrate_rounds picks for this host.
 
     Returns:
         A byte string representing the hashed password.
     """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    if rounds is None:
+        rounds = calibrate_rounds()
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -28,4 +91,101 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         True if the provided password matches
         the hashed password, False otherwise.
     """
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    start = time.perf_counter()
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    finally:
+        VERIFY_TIMINGS.observe(time.perf_counter() - start)
+
+
+@lru_cache(maxsize=None)
+def calibrate_rounds(target: float = 0.25, min_rounds: int = MIN_ROUNDS,
+                     max_rounds: int = MAX_ROUNDS) -> int:
+    """
+    Picks the highest bcrypt cost whose hashing time meets a target.
+
+    Each extra round doubles the hashing time, so the cost is raised one
+    round at a time until a hash takes longer than the target. The result
+    is cached, so the measurement runs once per process.
+
+    Args:
+        target: The hashing (and so verification) latency budget in
+        seconds.
+        min_rounds: The cost never goes below this, however slow the host.
+        max_rounds: The cost never goes above this, however fast the host.
+
+    Returns:
+        The calibrated work factor.
+    """
+    rounds = min_rounds
+    while rounds < max_rounds:
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds + 1))
+        if time.perf_counter() - start > target:
+            break
+        rounds += 1
+    return rounds
+
+
+def _ordered_map(func: Callable, items: Iterable,
+                 workers: int = None) -> Iterator:
+    """
+    Apply func to items on a thread pool, yielding results in order.
+
+    Unlike Executor.map, the input is consumed lazily: at most twice as
+    many items as workers are in flight, so arbitrarily long iterables
+    stream through in bounded memory.
+
+    Args:
+        func: The function to apply; bcrypt releases the GIL while
+        hashing, so threads run it in parallel.
+        items: The inputs to apply func to.
+        workers: Number of threads, defaults to the number of CPUs.
+
+    Returns:
+        An iterator over the results, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def hash_passwords(passwords: Iterable[str], rounds: int = None,
+                   workers: int = None) -> Iterator[bytes]:
+    """
+    Hashes many passwords in parallel.
+
+    Args:
+        passwords: The passwords to be hashed.
+        rounds: The bcrypt work factor (log2 of the iterations), defaults
+        to the cost calibrate_rounds picks for this host.
+        workers: Number of hashing threads, defaults to the number of CPUs.
+
+    Returns:
+        An iterator over the hashed passwords, in input order.
+    """
+    if rounds is None:
+        rounds = calibrate_rounds()
+    return _ordered_map(lambda password: hash_password(password, rounds),
+                        passwords, workers)
+
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]],
+                workers: int = None) -> Iterator[bool]:
+    """
+    Validates many passwords against their hashes in parallel.
+
+    Args:
+        pairs: (hashed_password, password) pairs to be validated.
+        workers: Number of hashing threads, defaults to the number of CPUs.
+
+    Returns:
+        An iterator over the results of is_valid, in input order.
+    """
+    return _ordered_map(lambda pair: is_valid(*pair), pairs, workers)
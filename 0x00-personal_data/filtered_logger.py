@@ -2,14 +2,97 @@
 """
 Filtered logger for sensitive data.
 """
-from typing import List
+from functools import lru_cache
+from typing import (Any, Callable, Dict, List, Mapping, Sequence, Tuple,
+                    Union)
+import atexit
+import queue
 import re
 import logging
+import logging.handlers
 import os
+import sqlite3
+import sys
+import threading
+import time
 import mysql.connector
 
 
 PII_FIELDS = ('name', 'email', 'phone', 'ssn', 'password')
+LOG_TARGETS = ('stderr', 'stdout', 'file', 'syslog')
+
+_handlers: Dict[tuple, logging.Handler] = {}
+_handlers_lock = threading.Lock()
+
+
+class Redactor:
+    """Redacts a fixed set of fields from messages in a single scan.
+
+    All fields are compiled into one alternation pattern, so the cost of
+    a redaction grows with the message length only, not with the number
+    of fields times the message length.
+    """
+
+    def __init__(self, fields: Sequence[str], redaction: str,
+                 separator: str):
+        """
+        Compile the redaction pattern.
+
+        Args:
+            fields (Sequence[str]): Fields whose values are obfuscated.
+            redaction (str): The string the values are replaced with.
+            separator (str): The character separating the fields.
+        """
+        self.fields = tuple(fields)
+        self.redaction = redaction
+        self.separator = separator
+        # longest first so that a field never shadows a longer one
+        # sharing its prefix
+        names = sorted(set(self.fields), key=len, reverse=True)
+        sep = re.escape(separator)
+        self._pattern = None
+        if names:
+            self._pattern = re.compile(
+                '({})=.*?{}'.format('|'.join(map(re.escape, names)), sep))
+        # a dict lookup per match is cheaper than expanding a \1 template
+        self._replacements = {name: '{}={}{}'.format(name, redaction,
+                                                     separator)
+                              for name in names}
+
+    def _replace(self, match: re.Match) -> str:
+        """Return the redacted form of a single field=value match."""
+        return self._replacements[match.group(1)]
+
+    def redact(self, message: str) -> str:
+        """
+        Obfuscate the values of the fields in a message.
+
+        Args:
+            message (str): The log message to obfuscate.
+
+        Returns:
+            str: The obfuscated log message.
+        """
+        if self._pattern is None:
+            return message
+        return self._pattern.sub(self._replace, message)
+
+
+@lru_cache(maxsize=128)
+def get_redactor(fields: Tuple[str, ...], redaction: str,
+                 separator: str) -> Redactor:
+    """
+    Return the cached Redactor for a (fields, separator, redaction) key.
+
+    Args:
+        fields (Tuple[str, ...]): Fields whose values are obfuscated.
+        redaction (str): The string the values are replaced with.
+        separator (str): The character separating the fields.
+
+    Returns:
+        Redactor: A compiled redactor shared by all callers with this key.
+    """
+    return Redactor(fields, redaction, separator)
 
 
 def filter_datum(fields: List[str], redaction: str,
@@ -26,22 +109,45 @@ def filter_datum(fields: List[str], redaction: str,
     Returns:
         str: The obfuscated log message.
     """
-    for field in fields:
-        message = re.sub(field + '=.*?' + separator,
-                         field + '=' + redaction + separator, message)
-    return message
+    return get_redactor(tuple(fields), redaction, separator).redact(message)
 
 
 class RedactingFormatter(logging.Formatter):
-    """Formatter to redact sensitive information from log messages."""
+    """Formatter to redact sensitive information from log messages.
+
+    A record carrying a mapping in its ``row`` extra, as in
+    ``logger.info("", extra={"row": row})``, is rendered from that
+    mapping with the PII values masked by key lookup, so no regex runs
+    over it; the message text, if any, is still redacted. Any other
+    record is formatted and then redacted.
+    """
 
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
+    ROW_ATTR = "row"
 
     def __init__(self, fields: List[str]):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self._pii = frozenset(fields)
+        self._redactor = get_redactor(tuple(fields), self.REDACTION,
+                                      self.SEPARATOR)
+
+    def render_row(self, row: Mapping[str, Any]) -> str:
+        """
+        Render a row as ``key=value;`` pairs with the PII values masked.
+
+        Args:
+            row (Mapping[str, Any]): Column names mapped to their values.
+
+        Returns:
+            str: The rendered and redacted row.
+        """
+        return " ".join(
+            "{}={}{}".format(k, self.REDACTION if k in self._pii else v,
+                             self.SEPARATOR)
+            for k, v in row.items())
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -54,37 +160,244 @@ class RedactingFormatter(logging.Formatter):
         Returns:
             str: The formatted and redacted log message.
         """
+        row = getattr(record, self.ROW_ATTR, None)
+        if isinstance(row, Mapping):
+            # the free text may hold PII too: only the row skips the regex
+            text = record.getMessage()
+            if text:
+                text = self._redactor.redact(text)
+            message = " ".join(filter(None, (text, self.render_row(row))))
+            # format a copy so other handlers still see the original record
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg, record.args = message, None
+            return super(RedactingFormatter, self).format(record)
         message = super(RedactingFormatter, self).format(record)
-        redacted = filter_datum(self.fields, self.REDACTION,
-                                message, self.SEPARATOR)
-        return redacted
+        return self._redactor.redact(message)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background QueueListener over a bounded queue.
+
+    Formatting, redaction and I/O all happen on the listener thread; the
+    logging thread only enqueues the record. When the queue is full the
+    record is dropped and counted, or the caller blocks if ``block`` is
+    set.
+    """
+
+    def __init__(self, handler: logging.Handler, queue_size: int = 10000,
+                 block: bool = False, timeout: float = None):
+        """
+        Start the listener that drains the queue into ``handler``.
+
+        Args:
+            handler (logging.Handler): Handler doing the actual output.
+            queue_size (int): Maximum number of pending records.
+            block (bool): Block the caller instead of dropping records
+            when the queue is full.
+            timeout (float): How long a blocking put may wait before the
+            record is dropped; None waits forever.
+        """
+        super(BoundedQueueHandler, self).__init__(queue.Queue(queue_size))
+        self.block = block
+        self.timeout = timeout
+        self.enqueued = 0
+        self.dropped = 0
+        self._counter_lock = threading.Lock()
+        self.listener = _DrainingQueueListener(self.queue, handler,
+                                               respect_handler_level=True)
+        self.listener.start()
+        self._listening = True
+        atexit.register(self.close)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Leave formatting and redaction to the listener thread."""
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record on the queue according to the overflow policy."""
+        self.queue.put(record, block=self.block, timeout=self.timeout)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Enqueue a record, counting it as dropped if the queue is full."""
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+        else:
+            with self._counter_lock:
+                self.enqueued += 1
+
+    def flush(self) -> None:
+        """Wait until every enqueued record has been written."""
+        if self._listening:
+            self.queue.join()
+
+    def close(self) -> None:
+        """Flush pending records and stop the listener thread."""
+        if self._listening:
+            self._listening = False
+            self.listener.stop()
+        super(BoundedQueueHandler, self).close()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the queue counters, for sizing the queue under load.
+
+        Returns:
+            Dict[str, int]: Current queue depth, queue capacity, and the
+            number of records enqueued and dropped so far.
+        """
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+        }
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        """Block until the sentinel fits, so pending records still drain."""
+        self.queue.put(self._sentinel)
+
+
+@lru_cache(maxsize=None)
+def get_formatter(fields: Tuple[str, ...] = PII_FIELDS) -> RedactingFormatter:
+    """
+    Return the shared RedactingFormatter for a set of PII fields.
+
+    Args:
+        fields (Tuple[str, ...]): Fields the formatter redacts.
+
+    Returns:
+        RedactingFormatter: One formatter instance per set of fields.
+    """
+    return RedactingFormatter(fields)
+
+
+def _build_handler(target: str, address: Union[str, Tuple[str, int]],
+                   max_bytes: int, backup_count: int) -> logging.Handler:
+    """
+    Build the output handler of a logger configuration.
+
+    Raises:
+        ValueError: If the target is unknown or needs a missing address.
+    """
+    if target == 'stderr':
+        return logging.StreamHandler()
+    if target == 'stdout':
+        return logging.StreamHandler(sys.stdout)
+    if target == 'file':
+        if address is None:
+            raise ValueError("file target requires a path address")
+        return logging.handlers.RotatingFileHandler(
+            address, maxBytes=max_bytes, backupCount=backup_count)
+    if target == 'syslog':
+        if address is None:
+            address = ('localhost', logging.handlers.SYSLOG_UDP_PORT)
+        return logging.handlers.SysLogHandler(address=address)
+    raise ValueError("unknown log target {!r}, expected one of {}".format(
+        target, LOG_TARGETS))
 
 
-def get_logger() -> logging.Logger:
+def get_handler(target: str = 'stderr',
+                address: Union[str, Tuple[str, int]] = None,
+                max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                async_mode: bool = False, queue_size: int = 10000,
+                block: bool = False) -> logging.Handler:
+    """
+    Return the cached redacting handler for a configuration.
+
+    Handlers are built once per configuration, so asking again for the
+    same configuration returns the very same handler.
+
+    Args:
+        target (str): One of 'stderr', 'stdout', 'file' or 'syslog'.
+        address (Union[str, Tuple[str, int]]): The file path for 'file',
+        a (host, port) pair or a unix socket path for 'syslog'.
+        max_bytes (int): Size at which a 'file' target is rotated.
+        backup_count (int): Number of rotated files kept for 'file'.
+        async_mode (bool): Format, redact and write records on a
+        background thread behind a bounded queue.
+        queue_size (int): Maximum number of pending records in async mode.
+        block (bool): In async mode, block the caller instead of dropping
+        records when the queue is full.
+
+    Returns:
+        logging.Handler: The handler for this configuration.
+    """
+    if isinstance(address, list):
+        address = tuple(address)
+    key = (target, address, max_bytes, backup_count)
+    if async_mode:
+        key += (queue_size, block)
+    with _handlers_lock:
+        handler = _handlers.get(key)
+        if handler is not None:
+            return handler
+    if async_mode:
+        handler = BoundedQueueHandler(
+            get_handler(target, address, max_bytes, backup_count),
+            queue_size, block)
+    else:
+        handler = _build_handler(target, address, max_bytes, backup_count)
+        handler.setFormatter(get_formatter())
+    with _handlers_lock:
+        if key in _handlers:
+            handler.close()
+            return _handlers[key]
+        _handlers[key] = handler
+    return handler
+
+
+def get_logger(target: str = 'stderr',
+               address: Union[str, Tuple[str, int]] = None,
+               async_mode: bool = False, queue_size: int = 10000,
+               block: bool = False, **handler_options) -> logging.Logger:
     """
     Return a configured logging.Logger object.
+
+    Calling it again never stacks another handler: the logger keeps
+    exactly one redacting handler, the cached one for the requested
+    configuration (see get_handler for the arguments).
     """
     logger = logging.getLogger("user_data")
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
-    handler = logging.StreamHandler()
-    formatter = RedactingFormatter(PII_FIELDS)
-
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    handler = get_handler(target, address, async_mode=async_mode,
+                          queue_size=queue_size, block=block,
+                          **handler_options)
+    with _handlers_lock:
+        managed = set(_handlers.values())
+    for other in list(logger.handlers):
+        if other is not handler and other in managed:
+            logger.removeHandler(other)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     return logger
 
 
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """
     Establish a connection to the MySQL database.
+
+    Setting PERSONAL_DATA_DB_ENGINE to 'sqlite' connects to the SQLite
+    file named by PERSONAL_DATA_DB_NAME instead, as a local stand-in.
     """
     user = os.getenv('PERSONAL_DATA_DB_USERNAME', 'root')
     passwd = os.getenv('PERSONAL_DATA_DB_PASSWORD', '')
     host = os.getenv('PERSONAL_DATA_DB_HOST', 'localhost')
     db_name = os.getenv('PERSONAL_DATA_DB_NAME')
 
+    if os.getenv('PERSONAL_DATA_DB_ENGINE', 'mysql') == 'sqlite':
+        return sqlite3.connect(db_name or ':memory:',
+                               check_same_thread=False)
     conn = mysql.connector.connect(user=user,
                                    password=passwd,
                                    host=host,
@@ -92,21 +405,76 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return conn
 
 
-def main():
+def report_progress(rows: int, elapsed: float) -> None:
     """
-    Main entry point to fetch and log sensitive data.
+    Write the export progress and rate to stderr.
+
+    Args:
+        rows (int): Number of rows exported so far.
+        elapsed (float): Seconds since the export started.
     """
-    db = get_db()
-    logger = get_logger()
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write("exported {} rows ({:.0f} rows/sec)\n".format(
+        rows, rate))
+
+
+def export_rows(db, logger: logging.Logger,
+                query: str = "SELECT * FROM users;", chunk_size: int = 1000,
+                progress: Callable[[int, float], None] = None,
+                progress_every: int = 10000) -> int:
+    """
+    Stream the rows of a query into a logger in bounded memory.
+
+    Rows are fetched chunk_size at a time with fetchmany and passed to
+    the logger as structured rows, so at most one chunk is held on the
+    client. With an async logger, fetching overlaps redaction and I/O.
+
+    Args:
+        db: A DB-API connection, as returned by get_db.
+        logger (logging.Logger): Logger receiving one record per row.
+        query (str): The query to export.
+        chunk_size (int): Number of rows fetched per round trip.
+        progress (Callable[[int, float], None]): Called with the rows
+        exported and the elapsed seconds, every progress_every rows and
+        once at the end.
+        progress_every (int): Rows between two progress reports.
+
+    Returns:
+        int: The number of rows exported.
+    """
+    start = time.perf_counter()
+    count = 0
+    next_report = progress_every
     cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    fields = cursor.column_names
+    try:
+        cursor.execute(query)
+        fields = [column[0] for column in cursor.description]
+        rows = cursor.fetchmany(chunk_size)
+        while rows:
+            for row in rows:
+                logger.info("", extra={"row": dict(zip(fields, row))})
+            count += len(rows)
+            if progress is not None and count >= next_report:
+                progress(count, time.perf_counter() - start)
+                next_report = count + progress_every
+            rows = cursor.fetchmany(chunk_size)
+    finally:
+        cursor.close()
+    for handler in logger.handlers:
+        handler.flush()
+    if progress is not None:
+        progress(count, time.perf_counter() - start)
+    return count
 
-    for row in cursor:
-        message = "".join("{}={}; ".format(k, v) for k, v in zip(fields, row))
-        logger.info(message.strip())
 
-    cursor.close()
+def main():
+    """
+    Main entry point to fetch and log sensitive data.
+    """
+    db = get_db()
+    logger = get_logger(async_mode=True, block=True)
+    chunk_size = int(os.getenv('PERSONAL_DATA_EXPORT_CHUNK_SIZE', 1000))
+    export_rows(db, logger, chunk_size=chunk_size, progress=report_progress)
     db.close()
 
 
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Redact PII from a log file in parallel.
+
+Usage: ./redact_log.py INPUT OUTPUT [-w WORKERS] [-c CHUNK_SIZE]
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Tuple
+import argparse
+import mmap
+import os
+import sys
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_redactor
+
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def split_lines(path: str, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split a file into (start, end) byte ranges ending on line boundaries.
+
+    Args:
+        path (str): The file to split.
+        chunk_size (int): Approximate size of each range in bytes.
+
+    Yields:
+        Tuple[int, int]: The start and end offsets of each range.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+            end = size if end == -1 else end + 1
+            yield start, end
+            start = end
+
+
+def redact_range(path: str, start: int, end: int,
+                 fields: Tuple[str, ...]) -> bytes:
+    """
+    Redact one byte range of a file, in a worker process.
+
+    Args:
+        path (str): The file to read from.
+        start (int): Offset of the first byte of the range.
+        end (int): Offset just past the last byte of the range.
+        fields (Tuple[str, ...]): Fields whose values are obfuscated.
+
+    Returns:
+        bytes: The redacted range.
+    """
+    redactor = get_redactor(fields, RedactingFormatter.REDACTION,
+                            RedactingFormatter.SEPARATOR)
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8', 'surrogateescape')
+    return redactor.redact(text).encode('utf-8', 'surrogateescape')
+
+
+def redact_file(src: str, dst: str, workers: int = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                fields: Tuple[str, ...] = PII_FIELDS) -> int:
+    """
+    Redact a log file into another, spreading chunks over processes.
+
+    Output chunks are written in input order. At most twice as many
+    chunks as workers are in flight, so memory stays bounded however
+    large the log.
+
+    Args:
+        src (str): The log file to redact.
+        dst (str): The file the redacted log is written to.
+        workers (int): Number of worker processes, defaults to the CPUs.
+        chunk_size (int): Approximate size of each chunk in bytes.
+        fields (Tuple[str, ...]): Fields whose values are obfuscated.
+
+    Returns:
+        int: The number of bytes written.
+    """
+    workers = workers or os.cpu_count() or 1
+    fields = tuple(fields)
+    written = 0
+    with open(dst, 'wb') as out, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, end in split_lines(src, chunk_size):
+            pending.append(pool.submit(redact_range, src, start, end,
+                                       fields))
+            if len(pending) >= 2 * workers:
+                written += out.write(pending.popleft().result())
+        while pending:
+            written += out.write(pending.popleft().result())
+    return written
+
+
+def main() -> None:
+    """
+    Parse the command line and redact the given log file.
+    """
+    parser = argparse.ArgumentParser(
+        description="Redact PII fields from a log file in parallel.")
+    parser.add_argument('input', help="log file to redact")
+    parser.add_argument('output', help="file to write the redacted log to")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('-c', '--chunk-size', type=int,
+                        default=DEFAULT_CHUNK_SIZE,
+                        help="approximate chunk size in bytes")
+    parser.add_argument('-f', '--fields', default=','.join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    args = parser.parse_args()
+    if args.chunk_size <= 0:
+        parser.error("chunk size must be positive")
+    fields = tuple(f for f in args.fields.split(',') if f)
+    try:
+        redact_file(args.input, args.output, args.workers, args.chunk_size,
+                    fields)
+    except OSError as e:
+        sys.exit("redact_log: {}".format(e))
+
+
+if __name__ == "__main__":
+    main()
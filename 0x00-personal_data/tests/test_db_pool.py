@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests of the connection pool.
+"""
+import sqlite3
+import pytest
+
+pytest.importorskip("mysql.connector")
+import db_pool  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """A pool of one connection to a SQLite database with a table."""
+    path = str(tmp_path / "db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE users (name TEXT)")
+    pool = ConnectionPool(
+        lambda: sqlite3.connect(path, check_same_thread=False), size=1)
+    yield pool
+    pool.close()
+
+
+def test_release_rolls_back(pool):
+    """A transaction left open by a failed block is not handed over."""
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users VALUES ('bob')")
+            raise RuntimeError("failed")
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone() == (0,)
+    assert pool.stats()["created"] == 1
+
+
+def test_release_drops_a_broken_connection(pool):
+    """A connection that can't roll back is closed, not pooled."""
+    conn = pool.acquire()
+    conn.close()
+    pool.release(conn)
+    assert pool.stats()["open"] == 0
+    with pool.connection() as conn:
+        conn.execute("SELECT 1")
+    assert pool.stats()["created"] == 2
+
+
+def test_get_db_pool_rejects_other_options(monkeypatch):
+    """The shared pool is created once, with the first options given."""
+    monkeypatch.setattr(db_pool, "_pool", None)
+    pool = db_pool.get_db_pool(size=2)
+    assert db_pool.get_db_pool() is pool
+    assert db_pool.get_db_pool(size=2) is pool
+    with pytest.raises(ValueError):
+        db_pool.get_db_pool(size=3)
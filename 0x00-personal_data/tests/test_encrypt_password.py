@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests of the password hashing helpers.
+"""
+import pytest
+
+pytest.importorskip("bcrypt")
+from encrypt_password import hash_passwords, verify_many  # noqa: E402
+
+ROUNDS = 4
+PASSWORDS = ["MyAmazingPassw0rd{}".format(i) for i in range(20)]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_hash_and_verify_many(workers):
+    """Hashes come back in input order and verify against their own
+    password only."""
+    hashes = list(hash_passwords(PASSWORDS, ROUNDS, workers))
+    assert len(set(hashes)) == len(PASSWORDS)
+    assert all(verify_many(zip(hashes, PASSWORDS), workers))
+    shifted = PASSWORDS[1:] + PASSWORDS[:1]
+    assert not any(verify_many(zip(hashes, shifted), workers))
+
+
+def test_hash_passwords_is_lazy():
+    """Passwords are consumed as results are read, not all at once."""
+    def passwords():
+        for i, password in enumerate(PASSWORDS):
+            consumed.append(i)
+            yield password
+
+    consumed = []
+    hashes = hash_passwords(passwords(), ROUNDS, workers=2)
+    next(hashes)
+    assert len(consumed) <= 5
+    assert len(list(hashes)) == len(PASSWORDS) - 1
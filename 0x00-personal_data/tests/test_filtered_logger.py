@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests of the redacting logger.
+"""
+import logging
+import pytest
+
+pytest.importorskip("mysql.connector")
+import filtered_logger  # noqa: E402
+from filtered_logger import PII_FIELDS, filter_datum  # noqa: E402
+
+
+@pytest.mark.parametrize("fields, message, expected", [
+    (["password", "date_of_birth"],
+     "name=egg;email=eggmin@eggsample.com;password=eggcellent;"
+     "date_of_birth=12/12/1986;",
+     "name=egg;email=eggmin@eggsample.com;password=xxx;"
+     "date_of_birth=xxx;"),
+    (["name", "username"], "username=bob;name=Bob;age=30;",
+     "username=xxx;name=xxx;age=30;"),
+    (["a.b"], "a.b=1;acb=2;", "a.b=xxx;acb=2;"),
+    ([], "name=bob;", "name=bob;"),
+    (["name"], "name=bob", "name=bob"),
+])
+def test_filter_datum(fields, message, expected):
+    """Every listed field is redacted, and nothing else."""
+    assert filter_datum(fields, 'xxx', message, ';') == expected
+
+
+def test_filter_datum_matches_one_substitution_per_field():
+    """The single scan gives what one substitution per field does."""
+    fields = ["field_{}".format(i) for i in range(0, 50, 3)]
+    message = "".join("field_{0}=value_{0};".format(i) for i in range(50))
+    expected = message
+    for field in fields:
+        expected = expected.replace(
+            "{}=value_{};".format(field, field[6:]),
+            "{}=***;".format(field))
+    assert filter_datum(fields, '***', message, ';') == expected
+
+
+def test_get_logger_keeps_one_handler(tmp_path):
+    """Asking for the logger again never stacks handlers."""
+    path = str(tmp_path / "out.log")
+    for _ in range(3):
+        logger = filtered_logger.get_logger('file', path)
+    assert len(logger.handlers) == 1
+    handler = logger.handlers[0]
+    assert filtered_logger.get_logger('file', path).handlers == [handler]
+    logger.info("", extra={"row": {"name": "Bob", "ip": "10.0.0.1"}})
+    logger.info("email=bob@dylan.com;")
+    handler.flush()
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0].endswith(": name=***; ip=10.0.0.1;")
+    assert lines[1].endswith(": email=***;")
+    filtered_logger.get_logger('stderr')
+    assert logger.handlers != [handler]
+    assert len(logger.handlers) == 1
+
+
+def test_formatter_redacts_pii_fields():
+    """Rows and messages both lose their PII values."""
+    formatter = filtered_logger.RedactingFormatter(PII_FIELDS)
+    record = logging.LogRecord("user_data", logging.INFO, None, None,
+                               "ssn=123; ip=1.2.3.4;", None, None)
+    assert formatter.format(record).endswith(": ssn=***; ip=1.2.3.4;")
+    record.row = {"phone": "555", "last_login": "today"}
+    assert formatter.format(record).endswith(
+        ": ssn=***; ip=1.2.3.4; phone=***; last_login=today;")
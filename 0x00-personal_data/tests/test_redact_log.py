@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests of the parallel log redaction.
+"""
+from concurrent.futures import Future
+import pytest
+
+pytest.importorskip("mysql.connector")
+import redact_log  # noqa: E402
+from filtered_logger import PII_FIELDS, filter_datum  # noqa: E402
+
+
+LINES = ["name=bob{0};email=bob{0}@x.com;ssn=12{0};ip=10.0.0.{0};\n".format(i)
+         for i in range(200)]
+
+
+class CountingExecutor:
+    """Runs tasks inline, tracking how many results are not taken yet."""
+
+    def __init__(self, max_workers=None):
+        """Initialize the counters."""
+        self.in_flight = 0
+        self.peak = 0
+
+    def __enter__(self):
+        """Use the executor."""
+        CountingExecutor.last = self
+        return self
+
+    def __exit__(self, *exc_info):
+        """Nothing to shut down."""
+
+    def submit(self, func, *args):
+        """Run func now, count its result until it is taken."""
+        future = Future()
+        future.set_result(func(*args))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        result = future.result
+
+        def take():
+            self.in_flight -= 1
+            return result()
+        future.result = take
+        return future
+
+
+def test_redacts_in_order(tmp_path):
+    """Chunks come out redacted and in input order."""
+    src, dst = tmp_path / "in.log", tmp_path / "out.log"
+    src.write_text(''.join(LINES))
+    redact_log.redact_file(str(src), str(dst), workers=2, chunk_size=100)
+    assert dst.read_text() == filter_datum(
+        list(PII_FIELDS), "***", ''.join(LINES), ";")
+
+
+def test_bounds_chunks_in_flight(tmp_path, monkeypatch):
+    """Only twice as many chunks as workers are held at once."""
+    monkeypatch.setattr(redact_log, "ProcessPoolExecutor", CountingExecutor)
+    src, dst = tmp_path / "in.log", tmp_path / "out.log"
+    src.write_text(''.join(LINES))
+    redact_log.redact_file(str(src), str(dst), workers=2, chunk_size=100)
+    assert CountingExecutor.last.peak == 4
+    assert len(dst.read_text().splitlines()) == len(LINES)
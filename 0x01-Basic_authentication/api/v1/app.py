@@ -4,11 +4,14 @@ This module defines routes for the API.
 """
 from os import getenv
 from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, g, request
+from typing import Callable
+import time
 from flask_cors import CORS
 
 # Import authentication modules
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, PathMatcher
+from api.v1.auth.auth_chain import AuthChain
 from api.v1.auth.basic_auth import BasicAuth
 
 # Create Flask app
@@ -20,13 +23,29 @@ app.register_blueprint(app_views)
 # Enable Cross-Origin Resource Sharing (CORS)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
-# Initialize authentication
+# Initialize authentication: AUTH_TYPE names a scheme, or several
+# separated by commas, tried in that order
+schemes = {
+    'auth': Auth,
+    'basic_auth': BasicAuth,
+}
 auth = None
-auth_type = getenv('AUTH_TYPE', 'auth')
-if auth_type == 'auth':
-    auth = Auth()
-if auth_type == 'basic_auth':
-    auth = BasicAuth()
+auth_types = [name.strip() for name in getenv('AUTH_TYPE', 'auth').split(',')
+              if name.strip() in schemes]
+if len(auth_types) == 1:
+    auth = schemes[auth_types[0]]()
+elif auth_types:
+    auth = AuthChain([schemes[name]() for name in auth_types])
+
+# Paths served without authentication, compiled once
+excluded_paths = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+])
+
+# Time the authentication stages in a Server-Timing response header
+auth_timing = getenv('AUTH_TIMING', '0') == '1'
 
 
 # Error handlers
@@ -48,23 +67,55 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+def stage(name: str, func: Callable, *args):
+    """Runs one authentication stage, timing it if AUTH_TIMING is set."""
+    if not auth_timing:
+        return func(*args)
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        g.setdefault('auth_timings', []).append(
+            (name, time.perf_counter() - start))
+
+
 # Middleware to authenticate user before processing request
 @app.before_request
 def authenticate_user():
-    """Authenticates a user before processing a request."""
-    if auth:
-        excluded_paths = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-        ]
-        if auth.require_auth(request.path, excluded_paths):
-            auth_header = auth.authorization_header(request)
-            user = auth.current_user(request)
-            if auth_header is None:
-                abort(401)
-            if user is None:
-                abort(403)
+    """Authenticates a user before processing a request.
+
+    Each stage only runs if the previous one requires it: excluded
+    paths skip the rest, a request without credentials is refused
+    before any user lookup, and so is one whose credentials no scheme
+    can handle (can_handle is a cheap probe). The user is resolved once
+    and kept in request.current_user for the views (None when the path
+    needs no authentication).
+    """
+    request.current_user = None
+    if not auth:
+        return
+    if not stage('exclusion', auth.require_auth,
+                 request.path, excluded_paths):
+        return
+    handled = stage('probe', auth.can_handle, request)
+    if not handled and \
+            stage('header', auth.authorization_header, request) is None:
+        abort(401)
+    if handled:
+        request.current_user = stage('user', auth.current_user, request)
+    if request.current_user is None:
+        abort(403)
+
+
+@app.after_request
+def add_server_timing(response):
+    """Reports the authentication stage durations, in ms."""
+    timings = g.get('auth_timings')
+    if timings:
+        response.headers.add('Server-Timing', ', '.join(
+            'auth-{};dur={:.3f}'.format(name, duration * 1000)
+            for name, duration in timings))
+    return response
 
 
 # Run the app
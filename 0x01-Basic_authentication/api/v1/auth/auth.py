@@ -1,20 +1,99 @@
 #!/usr/bin/env python3
 """Authentication module."""
 from flask import request
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import Iterable, List, TypeVar, Union
 import fnmatch
+import re
+
+
+def strip_slash(path: str) -> str:
+    """Removes the trailing slash of a path, other than the root.
+
+    Args:
+        path (str): The path.
+
+    Returns:
+        str: The path without its trailing slash.
+    """
+    if len(path) > 1 and path[-1] == '/':
+        return path[:-1]
+    return path
+
+
+class PathMatcher:
+    """Set of path patterns compiled once, to match paths quickly.
+
+    Literal paths go in a set; the wildcard patterns (fnmatch syntax:
+    `*`, `?`, `[...]`) are merged into one regex. Trailing slashes are
+    ignored on both sides: `/api/v1/status/` matches `/api/v1/status`
+    and the reverse.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """Compiles patterns.
+
+        Args:
+            patterns (Iterable[str]): The paths and wildcard patterns.
+        """
+        self.patterns = tuple(patterns)
+        self._literals = set()
+        wildcards = []
+        for pattern in self.patterns:
+            pattern = strip_slash(pattern)
+            if any(c in pattern for c in '*?['):
+                wildcards.append(fnmatch.translate(pattern))
+            else:
+                self._literals.add(pattern)
+        self._regex = None
+        if wildcards:
+            self._regex = re.compile('|'.join(wildcards))
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def of(cls, patterns: tuple) -> 'PathMatcher':
+        """Returns the matcher of patterns, compiled on first use.
+
+        Args:
+            patterns (tuple): The paths and wildcard patterns.
+
+        Returns:
+            PathMatcher: The matcher.
+        """
+        return cls(patterns)
+
+    def match(self, path: str) -> bool:
+        """Checks if a path matches one of the patterns.
+
+        Args:
+            path (str): The path to check.
+
+        Returns:
+            bool: True if it matches, False otherwise.
+        """
+        path = strip_slash(path)
+        if path in self._literals:
+            return True
+        return self._regex is not None and \
+            self._regex.match(path) is not None
+
+    def __len__(self) -> int:
+        """Returns the number of patterns."""
+        return len(self.patterns)
 
 
 class Auth:
     """Handles authentication logic."""
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], PathMatcher]) -> bool:
         """Checks if authentication is required for a given path.
 
         Args:
             path (str): The path to check for authentication requirement.
-            excluded_paths (List[str]): List of paths
-            exempted from authentication.
+            excluded_paths (List[str] | PathMatcher): Paths and wildcard
+            patterns exempted from authentication, ideally compiled once
+            in a PathMatcher (a list is compiled on its first use).
 
         Returns:
             bool: True if authentication is required, False otherwise.
@@ -25,11 +104,9 @@ class Auth:
         if excluded_paths is None or not excluded_paths:
             return True
 
-        for excluded_path in excluded_paths:
-            if fnmatch.fnmatch(path, excluded_path):
-                return False
-
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = PathMatcher.of(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """Gets the authorization header from the request.
@@ -45,6 +122,20 @@ class Auth:
             return request.headers.get('Authorization', None)
         return None
 
+    def can_handle(self, request=None) -> bool:
+        """Checks cheaply if the request carries credentials this
+        scheme can verify, before any lookup.
+
+        Args:
+            request (flask.Request, optional):
+            The Flask request object. Defaults to None.
+
+        Returns:
+            bool: False: this scheme authenticates no one, so it must not
+            claim a request ahead of another scheme of a chain.
+        """
+        return False
+
     def current_user(self, request=None) -> TypeVar('User'):
         """Gets the current user from the request.
 
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Authentication chain module for the API."""
+from typing import List, TypeVar
+
+from .auth import Auth
+
+
+class AuthChain(Auth):
+    """Authenticates with several schemes, tried in order.
+
+    Each scheme is probed with its cheap can_handle; only the first one
+    that can handle the request looks the user up, and its answer is
+    final: the other schemes do no work.
+    """
+
+    def __init__(self, schemes: List[Auth]):
+        """Initializes the chain.
+
+        Args:
+            schemes (List[Auth]): The schemes, in the order to try them.
+        """
+        self.schemes = list(schemes)
+
+    def scheme(self, request=None) -> Auth:
+        """Finds the scheme that handles a request.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            Auth: The first scheme that can handle it, otherwise None.
+        """
+        for scheme in self.schemes:
+            if scheme.can_handle(request):
+                return scheme
+        return None
+
+    def can_handle(self, request=None) -> bool:
+        """Checks if one of the schemes can handle the request.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            bool: True if a scheme can handle it, False otherwise.
+        """
+        return self.scheme(request) is not None
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """Retrieves the user with the scheme that handles the request.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            User: The authenticated user, otherwise None.
+        """
+        scheme = self.scheme(request)
+        if scheme is None:
+            return None
+        return scheme.current_user(request)
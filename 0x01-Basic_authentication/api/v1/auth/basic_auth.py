@@ -3,15 +3,125 @@
 import re
 import base64
 import binascii
-from typing import Tuple, TypeVar
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Optional, Tuple, TypeVar
 
 from .auth import Auth
 from models.user import User
 
 
+class CredentialCache:
+    """Bounded cache of verified Authorization headers.
+
+    Entries are keyed by an HMAC of the header under a secret drawn at
+    startup, so neither the header nor the password is kept. Each entry
+    holds the user id, email and password hash it was verified against,
+    and expires after `ttl` seconds. A hit is only served while the user
+    still exists with that email and password hash, so changing the
+    password or removing the user invalidates it. Failed
+    authentications are not cached.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        """Initializes an empty cache (max_entries 0 disables it).
+
+        Args:
+            max_entries (int): Number of headers kept, least recently
+            used dropped first.
+            ttl (float): Seconds a verification is trusted.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, authorization_header: str) -> bytes:
+        """Hashes a header under the secret.
+
+        Args:
+            authorization_header (str): The Authorization header.
+
+        Returns:
+            bytes: The key of the header.
+        """
+        return hmac.new(self._secret, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """Retrieves the user a header was verified for.
+
+        Args:
+            authorization_header (str): The Authorization header.
+
+        Returns:
+            User: The user if the header was verified less than ttl
+            seconds ago and the user didn't change its email or
+            password since, otherwise None.
+        """
+        key = self._key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, email, password, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(user_id)
+        if user is None or user.email != email or \
+                user.password != password:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """Records that a header authenticates a user.
+
+        Args:
+            authorization_header (str): The Authorization header.
+            user (User): The user it was verified for.
+        """
+        if self.max_entries < 1:
+            return
+        entry = (user.id, user.email, user.password,
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[self._key(authorization_header)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
 class BasicAuth(Auth):
     """Handles basic authentication for the API."""
 
+    def __init__(self, credentials: Optional[CredentialCache] = None):
+        """Initializes the authentication.
+
+        Args:
+            credentials (CredentialCache, optional): Cache of verified
+            headers. Defaults to one sized by AUTH_CACHE_SIZE, with a
+            lifetime of AUTH_CACHE_TTL seconds.
+        """
+        if credentials is None:
+            credentials = CredentialCache(
+                int(getenv('AUTH_CACHE_SIZE', 10000)),
+                float(getenv('AUTH_CACHE_TTL', 300)))
+        self.credentials = credentials
+
     def extract_base64_authorization_header(
             self,
             authorization_header: str) -> str:
@@ -102,6 +212,19 @@ class BasicAuth(Auth):
                 return users[0]
         return None
 
+    def can_handle(self, request=None) -> bool:
+        """Checks if the request has a Basic Authorization header.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            bool: True if the header uses the Basic scheme.
+        """
+        auth_header = self.authorization_header(request)
+        return auth_header is not None and \
+            auth_header.lstrip().startswith('Basic ')
+
     def current_user(self, request=None) -> TypeVar('User'):
         """Retrieves the user from a request.
 
@@ -113,7 +236,15 @@ class BasicAuth(Auth):
             otherwise None.
         """
         auth_header = self.authorization_header(request)
+        if auth_header is None:
+            return None
+        user = self.credentials.get(auth_header)
+        if user is not None:
+            return user
         b64_auth_token = self.extract_base64_authorization_header(auth_header)
         auth_token = self.decode_base64_authorization_header(b64_auth_token)
         email, password = self.extract_user_credentials(auth_token)
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credentials.put(auth_header, user)
+        return user
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+""" Module of the cache of serialized responses
+"""
+from collections import OrderedDict
+from flask import Response, make_response, request
+from os import getenv
+from typing import Callable, Optional, Tuple
+import hashlib
+import threading
+
+
+class ResponseCache():
+    """ Most recently used responses, each kept with the version of the
+    store it was built from
+
+    An entry is only served while the store is at that version: saving
+    or removing an object bumps the version, which invalidates every
+    entry at once. Bodies larger than `max_body` bytes aren't kept.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_body: int = 1 << 20):
+        """ Initialize an empty cache (max_entries 0 disables it)
+        """
+        self.max_entries = max_entries
+        self.max_body = max_body
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: str) -> Optional[Tuple]:
+        """ Return (body, mimetype, headers) of a response built at that
+        version, None if there is none
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def put(self, key: str, version: str, response: Response):
+        """ Keep a response built at a version, if small enough
+        """
+        body = response.get_data()
+        if self.max_entries < 1 or len(body) > self.max_body:
+            return
+        headers = {k: v for k, v in response.headers.items()
+                   if k not in ('Content-Type', 'Content-Length')}
+        with self._lock:
+            self._entries[key] = (version, body, response.mimetype, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Drop every entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+RESPONSES = ResponseCache(int(getenv('RESPONSE_CACHE_SIZE', 1024)))
+
+
+def cached(key: str, version: Optional[str],
+           build: Callable[[], Response]) -> Response:
+    """ Answer a GET from the cache, or by calling build()
+
+    With a store version, the response gets a strong ETag derived from
+    the version and the key: a request whose If-None-Match has it is
+    answered 304 without reading the store. Successful responses that
+    aren't streamed are cached for that version. Without a version
+    (the backend can't tell when objects change), build() answers.
+    """
+    if version is None:
+        return make_response(build())
+    etag = hashlib.sha1("{}|{}".format(version, key).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        entry = RESPONSES.get(key, version)
+        if entry is not None:
+            body, mimetype, headers = entry
+            response = Response(body, mimetype=mimetype, headers=headers)
+        else:
+            response = make_response(build())
+            if response.status_code != 200:
+                return response
+            if not response.is_streamed:
+                RESPONSES.put(key, version, response)
+    response.set_etag(etag)
+    return response
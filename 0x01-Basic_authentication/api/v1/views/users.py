@@ -2,35 +2,126 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from api.v1.views.cache import cached
+from flask import Response, abort, jsonify, request, url_for
+from itertools import islice
+from typing import Iterable, Iterator
+import json
 from models.user import User
 
+PAGE_SIZE = 100
+CHUNK_SIZE = 256
+NDJSON = 'application/x-ndjson'
+
+
+def json_chunks(objs_json: Iterable[dict], ndjson: bool) -> Iterator[str]:
+    """ Encode dictionaries as a JSON array, or one JSON per line,
+    yielding the text CHUNK_SIZE dictionaries at a time
+    """
+    texts = (json.dumps(obj_json, separators=(',', ':'))
+             for obj_json in objs_json)
+    separator = ''
+    if not ndjson:
+        yield '['
+    while True:
+        chunk = list(islice(texts, CHUNK_SIZE))
+        if not chunk:
+            break
+        if ndjson:
+            yield '\n'.join(chunk) + '\n'
+        else:
+            yield separator + ','.join(chunk)
+            separator = ','
+    if not ndjson:
+        yield ']'
+
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters:
+      - limit (optional): size of a page, ordered by created_at
+      - after (optional): id of the last User of the previous page
+      - format (optional): ndjson for one User per line
+        (also chosen by Accept: application/x-ndjson)
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, streamed as it is
+        serialized
+      - with limit or after, one page of them, and a Link header to the
+        next page when this one is full
+      - 400 if limit or after is invalid
+    Responses carry an ETag (304 to If-None-Match while no User
+    changed); pages are served from the response cache.
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    key = "{}|{}".format(request.full_path,
+                         request.headers.get('Accept', ''))
+    response = cached(key, User.version(), list_users)
+    response.vary.add('Accept')
+    return response
+
+
+def list_users() -> Response:
+    """ Build the response of GET /api/v1/users
+    """
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best_match(
+            ['application/json', NDJSON]) == NDJSON
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    headers = {}
+    if limit is None and after is None:
+        users_json = (user_json for _, user_json in User.json_items())
+    else:
+        try:
+            limit = PAGE_SIZE if limit is None else int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+        try:
+            page = list(User.query(order_by='created_at', limit=limit,
+                                   after=after))
+        except ValueError:
+            return jsonify({'error': "after is not a User ID"}), 400
+        if len(page) == limit:
+            headers['Link'] = '<{}>; rel="next"'.format(url_for(
+                'app_views.view_all_users', limit=limit, after=page[-1].id))
+        # a page is small: built at once, so that it can be cached
+        users_json = [user.to_json() for user in page]
+        return Response(''.join(json_chunks(users_json, ndjson)),
+                        headers=headers,
+                        mimetype=NDJSON if ndjson else 'application/json')
+    return Response(json_chunks(users_json, ndjson), headers=headers,
+                    mimetype=NDJSON if ndjson else 'application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
 def view_one_user(user_id: str = None) -> str:
     """ GET /api/v1/users/:id
     Path parameter:
-      - User ID
+      - User ID, or me for the authenticated User
     Return:
-      - User object JSON represented
+      - User object JSON represented, with an ETag (304 to
+        If-None-Match while no User changed)
       - 404 if the User ID doesn't exist
     """
     if user_id is None:
         abort(404)
-    user = User.get(user_id)
-    if user is None:
-        abort(404)
-    return jsonify(user.to_json())
+    if user_id == 'me':
+        # authenticated by the before_request hook: no lookup again
+        if getattr(request, 'current_user', None) is None:
+            abort(404)
+        user_id = request.current_user.id
+
+    def build():
+        """ Build the response from the User
+        """
+        user = User.get(user_id)
+        if user is None:
+            abort(404)
+        return jsonify(user.to_json())
+    return cached(url_for('app_views.view_one_user', user_id=user_id),
+                  User.version(), build)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -1,21 +1,656 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import TypeVar, List, Callable, Iterable, Iterator, Optional
+from operator import attrgetter
+from os import getenv, path
+import atexit
+import fcntl
 import json
+import os
+import threading
+import time
 import uuid
+from models.journal import Journal
+from models.lazy import LazyRecords
+from models.query import predicates, run_query, sort_key
+from models.rwlock import RWLock
+from models.sqlite_storage import SQLiteStorage
+from models.storage import Storage, matches
+from models.write_buffer import WriteBuffer
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TIMESTAMPS = ('created_at', 'updated_at')
 DATA = {}
+INDEXES = {}
+JOURNALS = {}
+BUFFERS = {}
+LAZY_CACHE_SIZES = {}
+STORAGES = {}
+
+
+class Index():
+    """ Secondary hash index: attribute JSON value -> ids of the objects
+
+    Values are given as attribute values or their JSON form.
+    """
+
+    def __init__(self, attribute: str):
+        """ Initialize an empty index on one attribute
+        """
+        self.attribute = attribute
+        # value -> {id: None}, a dict keeps the ids in insertion order
+        self._ids = {}
+        # id -> value it is indexed under, to move it on re-save
+        self._values = {}
+
+    def add(self, obj_id: str, value):
+        """ Index an object under the JSON value of its attribute
+        """
+        value = json_value(value)
+        self.discard(obj_id)
+        try:
+            self._ids.setdefault(value, {})[obj_id] = None
+        except TypeError:
+            return
+        self._values[obj_id] = value
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        if obj_id not in self._values:
+            return
+        value = self._values.pop(obj_id)
+        ids = self._ids[value]
+        del ids[obj_id]
+        if not ids:
+            del self._ids[value]
+
+    def lookup(self, value) -> Optional[Iterable[str]]:
+        """ Return the ids indexed under a value,
+        None if the value can't be looked up (unhashable)
+        """
+        try:
+            return self._ids.get(json_value(value), ())
+        except TypeError:
+            return None
+
+
+class SortedIndex():
+    """ Secondary ordered index: ids of the objects by attribute value,
+    for range scans and ordered iteration
+
+    Values are ordered as the objects hold them, like `query` orders
+    objects without an index: `parse` turns the JSON form of a value
+    (read from the file) back into that (a datetime, say).
+    """
+
+    def __init__(self, attribute: str, parse: Callable = None):
+        """ Initialize an empty index on one attribute
+        """
+        self.attribute = attribute
+        self.parse = parse
+        # (sort key of the value, id) in order; entries of removed or
+        # moved objects are left behind and skipped, until the next sort
+        self._entries = []
+        # the sort keys of _entries, in the same order, to bisect
+        self._entry_keys = []
+        # id -> sort key of the value it is indexed under
+        self._keys = {}
+        self._sorted = True
+        self._stale = 0
+
+    def add(self, obj_id: str, value):
+        """ Index an object under the value of its attribute
+        """
+        key = self._key(value)
+        old = self._keys.get(obj_id)
+        if old == key:
+            return
+        if old is not None:
+            self._stale += 1
+        self._keys[obj_id] = key
+        entry = (key, obj_id)
+        # appending in order (ids created in time order) needs no sort
+        if self._entries and entry < self._entries[-1]:
+            self._sorted = False
+        self._entries.append(entry)
+        self._entry_keys.append(key)
+
+    def _key(self, value) -> tuple:
+        """ Return the sort key of an attribute value or its JSON form
+        """
+        if self.parse is not None and isinstance(value, str):
+            try:
+                value = self.parse(value)
+            except ValueError:
+                pass
+        return sort_key(value)
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        if self._keys.pop(obj_id, None) is not None:
+            self._stale += 1
+
+    def lookup(self, value) -> list:
+        """ Return the ids indexed under a value
+        """
+        return list(self.scan(value, True, value, True))
+
+    def scan(self, low=None, low_inclusive: bool = True, high=None,
+             high_inclusive: bool = True, reverse: bool = False,
+             after: str = None) -> Iterator[str]:
+        """ Iterate over the ids whose value is within bounds (None for
+        no bound), in the order of the values then ids, starting after
+        the `after` id if given (KeyError if it isn't indexed)
+
+        The bounds are searched right away; the ids are then read lazily
+        and it is safe to save objects meanwhile.
+        """
+        if not self._sorted or self._stale > len(self._keys):
+            self._entries = sorted((key, obj_id)
+                                   for obj_id, key in self._keys.items())
+            self._entry_keys = [key for key, obj_id in self._entries]
+            self._sorted = True
+            self._stale = 0
+        entries = self._entries
+        keys = self._entry_keys
+        start = 0
+        stop = len(entries)
+        if low is not None:
+            bisect = bisect_left if low_inclusive else bisect_right
+            start = bisect(keys, self._key(low))
+        if high is not None:
+            bisect = bisect_right if high_inclusive else bisect_left
+            stop = bisect(keys, self._key(high))
+        if after is not None:
+            cursor = (self._keys[after], after)
+            if reverse:
+                stop = min(stop, bisect_left(entries, cursor))
+            else:
+                start = max(start, bisect_right(entries, cursor))
+        if reverse:
+            positions = range(stop - 1, start - 1, -1)
+        else:
+            positions = range(start, stop)
+        return self._ids(entries, positions, self._stale > 0)
+
+    def _ids(self, entries: list, positions: range,
+             deduplicate: bool) -> Iterator[str]:
+        """ Iterate over the ids of the live entries at positions
+        (new entries are only ever appended, or sorted into a new list)
+        """
+        keys = self._keys
+        seen = set()
+        for position in positions:
+            key, obj_id = entries[position]
+            if keys.get(obj_id) != key:
+                continue
+            if deduplicate:
+                if obj_id in seen:
+                    continue
+                seen.add(obj_id)
+            yield obj_id
+
+
+def json_value(value):
+    """ Return the JSON form of an attribute value
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+    (fromisoformat is many times faster than strptime)
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def slot_names(cls: type) -> tuple:
+    """ Return the attributes declared in the __slots__ of a class
+    and its parents, in definition order (parents first)
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(name for name in slots
+                     if name not in ('__dict__', '__weakref__'))
+    return tuple(names)
+
+
+def compile_serializer(cls: type):
+    """ Return a to_json(obj, for_serialization) function for a class
+
+    The slot names are read once here: serializing an object then fetches
+    all its values with a single attrgetter call. Attributes outside the
+    slots (subclasses without __slots__ get a __dict__) come after them.
+    """
+    names = slot_names(cls)
+    public = tuple(name for name in names if name[0] != '_')
+    getters = {True: (names, attrgetter(*names)),
+               False: (public, attrgetter(*public))}
+
+    def to_json(obj, for_serialization: bool = False) -> dict:
+        """ Convert an object to a JSON dictionary
+        """
+        keys, getter = getters[for_serialization]
+        try:
+            values = getter(obj)
+            if len(keys) == 1:
+                values = (values,)
+        except AttributeError:
+            # some slot was never assigned: keep only the assigned ones
+            keys = [key for key in keys if hasattr(obj, key)]
+            values = [getattr(obj, key) for key in keys]
+        result = {}
+        for key, value in zip(keys, values):
+            if type(value) is datetime:
+                # same text as TIMESTAMP_FORMAT for naive datetimes,
+                # about 3 times faster than strftime
+                if value.tzinfo is None and value.year >= 1000:
+                    value = value.isoformat('T', 'seconds')
+                else:
+                    value = value.strftime(TIMESTAMP_FORMAT)
+            result[key] = value
+        for key, value in getattr(obj, '__dict__', {}).items():
+            if for_serialization or key[0] != '_':
+                result[key] = json_value(value)
+        return result
+    return to_json
+
+
+@atexit.register
+def close_storage():
+    """ Persist the buffered writes and journal records at exit
+    """
+    for buffer in list(BUFFERS.values()):
+        buffer.flush()
+    for journal in JOURNALS.values():
+        journal.close()
+    for storage in STORAGES.values():
+        storage.close()
+
+
+class JsonStorage(Storage):
+    """ Objects kept in memory (in DATA), persisted to the
+    `.db_<Class>.json` file, or to a journal: the default backend
+
+    Threads share the objects through a reader-writer lock: reads run
+    together, a save or remove holds it exclusively while it updates
+    DATA and the indexes. Loading builds a new store aside and swaps it
+    in, and persisting serializes a snapshot taken under the read lock,
+    so reads never wait on file I/O. A second lock makes threads
+    persist one at a time.
+
+    With a `refresh_interval` (or STORAGE_REFRESH_INTERVAL=<seconds>),
+    processes sharing the file stay coherent: reads check, at most once
+    per interval, whether the file changed (inode, mtime, size) and pick
+    up what other processes saved. Writers lock the file and refresh
+    before rewriting it, so they don't drop each other's changes. With
+    STORAGE_FORMAT=jsonl, a refresh only parses the lines that changed.
+    The journal assumes a single process and is never refreshed.
+    """
+
+    def __init__(self, model: type, refresh_interval: float = None):
+        """ Initialize the backend of a model class
+        """
+        super().__init__(model)
+        if refresh_interval is None and getenv('STORAGE_REFRESH_INTERVAL'):
+            refresh_interval = float(getenv('STORAGE_REFRESH_INTERVAL'))
+        self.refresh_interval = refresh_interval
+        self.rwlock = RWLock()
+        self._lock = threading.RLock()
+        # bumped on every change, under the write lock; the token tells
+        # apart the versions of other processes and instances
+        self._version = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._checked = time.monotonic()
+        self._signature = None
+        # hash of each .jsonl line read or written -> id of its object
+        self._lines = {}
+
+    def _stat(self) -> Optional[tuple]:
+        """ Return what identifies a version of the file, None if absent
+        """
+        try:
+            st = os.stat(self.model._file_path())
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def load(self, kept: dict = {}):
+        """ Load all objects from file, then put the `kept` objects
+        (None for removed ones) by id over them
+        """
+        with self._lock:
+            self._signature = self._stat()
+            self._lines = {}
+            cls = self.model
+            objs = cls._new_store()
+            indexes = cls._new_indexes()
+            self._load(objs, indexes)
+            for obj_id, obj in kept.items():
+                self._place(objs, indexes, obj_id, obj)
+            with self.rwlock.write():
+                DATA[cls.__name__] = objs
+                INDEXES[cls.__name__] = indexes
+                self._version += 1
+
+    def _load(self, objs: dict, indexes: dict):
+        """ Load all objects from file into objs and indexes
+        """
+        cls = self.model
+        file_path = cls._file_path()
+        if cls._journal() is None and getenv('STORAGE_BACKEND') == 'journal':
+            cls.use_journal()
+        journal = cls._journal()
+        if journal is not None:
+            for obj_id, obj_json in journal.load().items():
+                cls._load_json(obj_id, obj_json, objs, indexes)
+            return
+        if not path.exists(file_path):
+            return
+
+        with open(file_path, 'r') as f:
+            if file_path.endswith('.jsonl'):
+                # one object per line: never holds more than one document
+                for line in f:
+                    if line.strip():
+                        obj_json = json.loads(line)
+                        cls._load_json(obj_json['id'], obj_json,
+                                       objs, indexes)
+                        if self.refresh_interval is not None:
+                            self._lines[hash(line)] = obj_json['id']
+            else:
+                objs_json = json.load(f)
+                for obj_id, obj_json in objs_json.items():
+                    cls._load_json(obj_id, obj_json, objs, indexes)
+
+    def refresh(self, skip: Iterable[str] = ()):
+        """ Pick up the changes made to the file since it was last read
+        or written, except to the objects with an id in skip
+        """
+        cls = self.model
+        if cls._journal() is not None:
+            return
+        with self._lock:
+            signature = self._stat()
+            if signature == self._signature:
+                return
+            objs = DATA[cls.__name__]
+            if signature is None or not cls._file_path().endswith('.jsonl'):
+                self.load({obj_id: objs.get(obj_id) for obj_id in skip})
+                return
+            self._signature = signature
+            skip = set(skip)
+            lines = {}
+            changed = []
+            with open(cls._file_path(), 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    key = hash(line)
+                    obj_id = self._lines.get(key)
+                    if obj_id is None:
+                        # a new or changed object: the only lines parsed
+                        obj_json = json.loads(line)
+                        obj_id = obj_json['id']
+                        if obj_id not in skip:
+                            changed.append((obj_id, obj_json))
+                    lines[key] = obj_id
+            seen = set(lines.values())
+            with self.rwlock.write():
+                self._version += 1
+                indexes = cls._indexes()
+                for obj_id, obj_json in changed:
+                    cls._load_json(obj_id, obj_json, objs, indexes)
+                for obj_id in [obj_id for obj_id in objs
+                               if obj_id not in seen and obj_id not in skip]:
+                    self._place(objs, indexes, obj_id, None)
+            self._lines = lines
+
+    def version(self) -> str:
+        """ Return a tag that changes whenever the objects change
+        """
+        self._refresh_if_due()
+        return "{}.{}".format(self._token, self._version)
+
+    def _refresh_if_due(self):
+        """ Refresh if coherence is on and the interval has elapsed
+        """
+        if self.refresh_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._checked < self.refresh_interval:
+            return
+        # writes still buffered are newer than the file; asked before
+        # taking the lock, which a flush holds while the buffer persists
+        skip = self.model._buffer().pending_ids()
+        # a thread persisting holds the lock during the whole flush, and
+        # refreshes before writing anyway: don't make the read wait, the
+        # next one checks again
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            self.refresh(skip=skip)
+        finally:
+            self._lock.release()
+
+    def written(self, lines: dict = None):
+        """ Record that this process just wrote the file: lines maps the
+        hash of each .jsonl line to the id of its object
+        """
+        self._signature = self._stat()
+        if self.refresh_interval is not None:
+            self._lines = lines or {}
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """ Hold the lock to persist, across processes if coherent
+        """
+        with self._lock:
+            if self.refresh_interval is None:
+                yield
+                return
+            with open(self.model._file_path() + ".lock", 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+
+    @staticmethod
+    def _place(objs: dict, indexes: dict, obj_id: str,
+               obj: Optional[TypeVar('Base')]):
+        """ Put an object in objs and indexes, None to remove it
+        """
+        if obj is not None:
+            objs[obj_id] = obj
+            for attr, index in indexes.items():
+                index.add(obj_id, getattr(obj, attr, None))
+        elif obj_id in objs:
+            del objs[obj_id]
+            for index in indexes.values():
+                index.discard(obj_id)
+
+    def get(self, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self._refresh_if_due()
+        with self.rwlock.read():
+            return DATA[self.model.__name__].get(obj_id)
+
+    def search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        """
+        self._refresh_if_due()
+        with self.rwlock.read():
+            return self._search(attributes)
+
+    def _search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes, the read lock
+        must be held
+        """
+        objs = DATA[self.model.__name__]
+        candidates = None
+        indexes = self.model._indexes()
+        for k, v in attributes.items():
+            if k in indexes:
+                ids = indexes[k].lookup(v)
+                if ids is not None and (candidates is None or
+                                        len(ids) < len(candidates)):
+                    candidates = ids
+        if candidates is not None:
+            # candidates are re-checked: the index reflects saved values
+            return [obj for obj in (objs[obj_id] for obj_id in candidates
+                                    if obj_id in objs)
+                    if matches(obj, attributes)]
+        if isinstance(objs, LazyRecords) and attributes:
+            # match the records first, only build the objects found
+            attributes_json = {k: json_value(v) for k, v in attributes.items()}
+            return [objs[obj_id] for obj_id in objs.scan(attributes_json)]
+        return [obj for obj in objs.values() if matches(obj, attributes)]
+
+    def query(self, where: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0,
+              after: str = None) -> Iterator:
+        """ Iterate lazily over the objects matching predicates,
+        see Base.query
+        """
+        self._refresh_if_due()
+        where = predicates(where)
+        with self.rwlock.read():
+            objs = DATA[self.model.__name__]
+            cursor = None
+            if after is not None:
+                cursor = objs.get(after)
+                if cursor is None:
+                    raise ValueError(
+                        "no object {} to start after".format(after))
+            ids, ordered = self._plan(objs, where, order_by, after)
+        found = (obj for obj in map(objs.get, ids) if obj is not None)
+        return run_query(found, where, order_by, limit, offset, ordered,
+                         cursor)
+
+    def _plan(self, objs: dict, where: dict, order_by: str,
+              after: str = None) -> tuple:
+        """ Return the ids to read for a query, and whether they come in
+        the order_by order (and start after the `after` id), the read
+        lock must be held
+
+        In order of preference: the ids of an equality or `in` lookup in
+        a hash or sorted index (the fewest if several), the scan of the
+        sorted index of order_by (bounded by its predicate, if any), the
+        range scan of a sorted index, or all the ids.
+        """
+        indexes = self.model._indexes()
+        candidates = None
+        for attr, cond in where.items():
+            values = cond.values()
+            if attr not in indexes or values is None:
+                continue
+            lookups = [indexes[attr].lookup(v) for v in values]
+            if None in lookups:
+                continue
+            # dict.fromkeys drops duplicates and keeps the ids in order
+            ids = list(dict.fromkeys(obj_id for found in lookups
+                                     for obj_id in found))
+            if candidates is None or len(ids) < len(candidates):
+                candidates = ids
+        if candidates is not None:
+            return candidates, False
+
+        if order_by is not None:
+            attr = order_by.lstrip('-')
+            index = indexes.get(attr)
+            if isinstance(index, SortedIndex):
+                bounds = where[attr].bounds() if attr in where else None
+                return index.scan(*(bounds or (None, True, None, True)),
+                                  reverse=order_by.startswith('-'),
+                                  after=after), True
+        for attr, cond in where.items():
+            bounds = cond.bounds()
+            if isinstance(indexes.get(attr), SortedIndex) and bounds:
+                return indexes[attr].scan(*bounds), False
+        return list(objs), False
+
+    def put(self, obj: TypeVar('Base')):
+        """ Store an object and persist it
+        """
+        cls = self.model
+        with self.rwlock.write():
+            self._place(DATA[cls.__name__], cls._indexes(), obj.id, obj)
+            self._version += 1
+        cls._write(obj.id, obj)
+
+    def delete(self, obj_id: str):
+        """ Remove an object and persist it
+        """
+        cls = self.model
+        with self.rwlock.write():
+            objs = DATA[cls.__name__]
+            if obj_id not in objs:
+                return
+            self._place(objs, cls._indexes(), obj_id, None)
+            self._version += 1
+        cls._write(obj_id, None)
+
+    def count(self) -> int:
+        """ Count all objects
+        """
+        self._refresh_if_due()
+        return len(DATA[self.model.__name__].keys())
+
+    def json_items(self, for_serialization: bool = False) -> Iterator[tuple]:
+        """ Iterate over (id, to_json()) of all objects,
+        without building them in lazy mode
+        """
+        self._refresh_if_due()
+        objs = DATA[self.model.__name__]
+        if isinstance(objs, LazyRecords):
+            return objs.json_items(for_serialization)
+        # serialize a snapshot: the lock is only held to copy the dict
+        with self.rwlock.read():
+            objs = objs.copy()
+        return ((obj_id, obj.to_json(for_serialization))
+                for obj_id, obj in objs.items())
 
 
 class Base():
     """ Base class
+
+    Subclasses list in `indexed_attributes` the attributes equality
+    searches are most often made on: those are kept in hash indexes
+    (as saved, removed or loaded) so `search` finds them without a scan.
+    Those in `sorted_attributes` are kept in sorted indexes, which
+    `query` uses for range and prefix predicates and to order results.
+
+    In lazy mode (`use_lazy_loading`) the objects of a class are kept as
+    compact records and only built when `get` or `search` return them.
+
+    Attributes are declared in `__slots__`, so instances carry no
+    __dict__; `to_json` uses a serializer compiled once per class.
+
+    Objects are stored by a backend (see models.storage.Storage): the
+    JsonStorage by default, or a SQLiteStorage shared by processes
+    (`use_storage`, or STORAGE_BACKEND=sqlite). Journal, lazy loading
+    and buffered writes are options of the JsonStorage.
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at')
+    indexed_attributes = ()
+    sorted_attributes = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -23,15 +658,13 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -47,91 +680,310 @@ class Base():
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
-        result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+        cls = self.__class__
+        serializer = cls.__dict__.get('_serializer')
+        if serializer is None:
+            serializer = compile_serializer(cls)
+            cls._serializer = serializer
+        return serializer(self, for_serialization)
+
+    @classmethod
+    def use_lazy_loading(cls, cache_size: int = 1024):
+        """ Keep the objects of the class as compact records, building
+        instances on access and caching the cache_size most recent ones.
+        Setting STORAGE_LAZY_CACHE=<cache_size> does it on load_from_file.
+        """
+        s_class = cls.__name__
+        LAZY_CACHE_SIZES[s_class] = cache_size
+        records = LazyRecords(cls, cache_size)
+        for obj_id, obj in list(DATA.get(s_class, {}).items()):
+            records[obj_id] = obj
+        DATA[s_class] = records
+
+    @classmethod
+    def _new_store(cls):
+        """ Return an empty mapping for the objects of the class
+        """
+        s_class = cls.__name__
+        if s_class not in LAZY_CACHE_SIZES and getenv('STORAGE_LAZY_CACHE'):
+            LAZY_CACHE_SIZES[s_class] = int(getenv('STORAGE_LAZY_CACHE'))
+        if s_class in LAZY_CACHE_SIZES:
+            return LazyRecords(cls, LAZY_CACHE_SIZES[s_class])
+        return {}
+
+    @classmethod
+    def _load_json(cls, obj_id: str, obj_json: dict, objs: dict,
+                   indexes: dict):
+        """ Store and index one object read from the file
+        in objs and indexes
+        """
+        if isinstance(objs, LazyRecords):
+            objs.put_json(obj_id, obj_json)
+        else:
+            objs[obj_id] = cls(**obj_json)
+        for attr, index in indexes.items():
+            index.add(obj_id, obj_json.get(attr))
+
+    @classmethod
+    def use_storage(cls, storage: Storage):
+        """ Store the objects of the class in a backend
+        """
+        s_class = cls.__name__
+        previous = STORAGES.get(s_class)
+        if previous is not None:
+            previous.close()
+        STORAGES[s_class] = storage
+
+    @classmethod
+    def _storage(cls) -> Storage:
+        """ Return the backend of the class: a SQLiteStorage on
+        STORAGE_SQLITE_PATH (default `.db.sqlite3`) if
+        STORAGE_BACKEND=sqlite, else a JsonStorage
+        """
+        s_class = cls.__name__
+        storage = STORAGES.get(s_class)
+        if storage is None:
+            if getenv('STORAGE_BACKEND') == 'sqlite':
+                storage = SQLiteStorage(
+                    cls, getenv('STORAGE_SQLITE_PATH', '.db.sqlite3'))
             else:
-                result[key] = value
-        return result
+                storage = JsonStorage(cls)
+            storage = STORAGES.setdefault(s_class, storage)
+        return storage
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def json_items(cls, for_serialization: bool = False) -> Iterator[tuple]:
+        """ Iterate over (id, to_json()) of all objects,
+        without building them when the backend can
+        """
+        return cls._storage().json_items(for_serialization)
+
+    @classmethod
+    def all_json(cls) -> List[dict]:
+        """ Return the to_json() of all objects
+        """
+        return [obj_json for _, obj_json in cls.json_items()]
+
+    @classmethod
+    def use_journal(cls, **options):
+        """ Persist the class through an append-only journal
+        (see models.journal.Journal for the options) instead of
+        rewriting the whole file on every save/remove.
+        Setting STORAGE_BACKEND=journal does it on load_from_file.
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        journal = JOURNALS.pop(s_class, None)
+        if journal is not None:
+            journal.close()
+        JOURNALS[s_class] = Journal(".db_{}.json".format(s_class), **options)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _journal(cls) -> Optional[Journal]:
+        """ Return the journal of the class, None if it has none
+        """
+        return JOURNALS.get(cls.__name__)
+
+    @classmethod
+    def _snapshot(cls) -> dict:
+        """ Return the JSON of all objects, by id
+        """
+        return dict(cls.json_items(True))
+
+    @classmethod
+    def _file_path(cls) -> str:
+        """ Return the file the objects are stored in:
+        `.db_<Class>.jsonl`, one object per line, if STORAGE_FORMAT=jsonl,
+        else `.db_<Class>.json`
+        """
+        if getenv('STORAGE_FORMAT') == 'jsonl':
+            return ".db_{}.jsonl".format(cls.__name__)
+        return ".db_{}.json".format(cls.__name__)
+
+    @classmethod
+    def load_from_file(cls):
+        """ Load all objects from file
+        """
+        cls._storage().load()
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        file_path = cls._file_path()
+        journal = cls._journal()
+        if journal is not None:
+            journal.compact(cls._snapshot, wait=True)
+            return
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        storage = cls._storage()
+        lines = {}
+        # write aside then rename, so a crash never leaves a torn file
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            if file_path.endswith('.jsonl'):
+                for obj_id, obj_json in cls.json_items(True):
+                    line = json.dumps(obj_json) + '\n'
+                    f.write(line)
+                    lines[hash(line)] = obj_id
+            else:
+                json.dump(cls._snapshot(), f)
+        os.replace(tmp_path, file_path)
+        if isinstance(storage, JsonStorage):
+            storage.written(lines)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__._storage().put(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__._storage().delete(self.id)
+
+    @classmethod
+    def _buffer(cls) -> WriteBuffer:
+        """ Return the write buffer of the class
+        """
+        s_class = cls.__name__
+        buffer = BUFFERS.get(s_class)
+        if buffer is None:
+            buffer = BUFFERS.setdefault(s_class, WriteBuffer(cls._persist))
+        return buffer
+
+    @classmethod
+    def _write(cls, obj_id: str, obj: Optional[TypeVar('Base')]):
+        """ Persist the new state of one object, None if it was removed,
+        now or through the write buffer
+        """
+        buffer = cls._buffer()
+        if buffer.buffering:
+            buffer.add(obj_id, obj)
+        else:
+            cls._persist({obj_id: obj})
+
+    @classmethod
+    def _persist(cls, changes: dict):
+        """ Persist changed objects (None for removed ones), by id
+        """
+        journal = cls._journal()
+        if journal is None:
+            storage = cls._storage()
+            with storage.locked():
+                if storage.refresh_interval is not None:
+                    # don't overwrite what other processes saved meanwhile
+                    storage.refresh(skip=changes)
+                cls.save_to_file()
+            return
+        journal.write_batch({
+            obj_id: None if obj is None else obj.to_json(True)
+            for obj_id, obj in changes.items()})
+        if journal.needs_compaction():
+            journal.compact(cls._snapshot, if_needed=True)
+
+    @classmethod
+    @contextmanager
+    def batch(cls) -> Iterator[None]:
+        """ Coalesce the save/remove calls made in a with block
+        into a single persisted write when the block exits
+        """
+        buffer = cls._buffer()
+        buffer.begin()
+        try:
+            yield
+        finally:
+            buffer.end()
+
+    @classmethod
+    def defer_writes(cls, max_delay: Optional[float] = 1.0,
+                     max_pending: int = 1000):
+        """ Buffer every save/remove and persist them together, once
+        max_pending objects are waiting or max_delay seconds after the
+        first one; max_delay bounds the writes a crash can lose.
+        max_delay=None persists every write again immediately.
+        """
+        cls._buffer().defer(max_delay, max_pending)
+
+    @classmethod
+    def flush(cls):
+        """ Persist the buffered writes now
+        """
+        cls._buffer().flush()
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Return the indexes of the class, by attribute
+        """
+        s_class = cls.__name__
+        indexes = INDEXES.get(s_class)
+        if indexes is None:
+            indexes = INDEXES.setdefault(s_class, cls._new_indexes())
+        return indexes
+
+    @classmethod
+    def _new_indexes(cls) -> dict:
+        """ Return empty indexes for the class, by attribute
+        """
+        indexes = {attr: Index(attr) for attr in cls.indexed_attributes}
+        for attr in cls.sorted_attributes:
+            parse = parse_timestamp if attr in TIMESTAMPS else None
+            indexes[attr] = SortedIndex(attr, parse)
+        return indexes
+
+    @classmethod
+    def refresh(cls):
+        """ Pick up the changes other processes made to the objects
+        """
+        cls._storage().refresh()
+
+    @classmethod
+    def version(cls) -> Optional[str]:
+        """ Return a tag that changes whenever an object of the class is
+        saved, removed or reloaded, None if the backend can't tell
+        """
+        return cls._storage().version()
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls._storage().count()
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all objects
         """
-        return cls.search()
+        return cls.query()
+
+    @classmethod
+    def query(cls, where: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0, after: str = None) \
+            -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the objects matching `where`
+
+        `where` maps attributes to a value they must equal, or to a
+        predicate of models.query (In, Prefix, Range). Results are sorted
+        on `order_by` ('-<attribute>' for descending order) then id, if
+        given, and the first `offset` ones skipped. For cursor
+        pagination, `after` is the id of the last object of the previous
+        page: results start right after it (ValueError if it doesn't
+        exist). Objects are read as the iterator advances, and no more
+        than needed for `limit` results when the order comes from a
+        sorted index or there is none.
+        """
+        if after is not None and order_by is None:
+            raise ValueError("after needs an order_by")
+        return cls._storage().query(where, order_by, limit, offset, after)
 
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls._storage().get(id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls._storage().search(attributes)
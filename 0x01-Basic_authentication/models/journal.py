@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+""" Journal module: append-only persistence of model objects
+"""
+from typing import Callable
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+
+class Journal():
+    """ Append-only journal of put/delete records over a JSON snapshot
+
+    The snapshot has the format of the `.db_<Class>.json` files. Every
+    mutation appends one JSON line to `<snapshot>.journal` instead of
+    rewriting the snapshot, handed to the OS at once (it survives a crash
+    of the process); lines are fsync'ed in groups of `group_size` records
+    or `group_interval` seconds after the first of a group, whichever
+    comes first (no interval, 0 or None, means no time limit).
+    Once `compact_threshold` records are journaled, a background thread
+    writes a fresh snapshot and the journal restarts empty.
+    """
+
+    def __init__(self, snapshot_path: str, group_size: int = 1,
+                 group_interval: float = None,
+                 compact_threshold: int = 10000):
+        """ Initialize a journal next to a snapshot file
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.compacting_path = self.journal_path + ".compacting"
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._timer = None
+        self._records = 0
+        self._compactor = None
+
+    def load(self) -> dict:
+        """ Return the objects JSON by id: the snapshot with the journal
+        replayed on top of it
+        """
+        self.wait_compaction()
+        objs_json = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                objs_json = json.load(f)
+        # a leftover segment means a compaction was interrupted: it holds
+        # older records than the current journal, so it is replayed first,
+        # then the compaction is finished before the next one could
+        # overwrite the segment
+        if self._replay(self.compacting_path, objs_json):
+            self._store_snapshot(objs_json)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+        self._records = self._replay(self.journal_path, objs_json)
+        return objs_json
+
+    @staticmethod
+    def _replay(file_path: str, objs_json: dict) -> int:
+        """ Apply the records of a journal file, return how many there were
+
+        A torn last record (crash mid-append) is cut off the file.
+        """
+        if not os.path.exists(file_path):
+            return 0
+        count = 0
+        valid_size = 0
+        with open(file_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record['op'] == 'put':
+                    objs_json[record['id']] = record['obj']
+                else:
+                    objs_json.pop(record['id'], None)
+                valid_size += len(line)
+                count += 1
+        if valid_size < os.path.getsize(file_path):
+            with open(file_path, 'r+b') as f:
+                f.truncate(valid_size)
+        return count
+
+    def put(self, obj_id: str, obj_json: dict):
+        """ Journal the new state of an object
+        """
+        self._append({'op': 'put', 'id': obj_id, 'obj': obj_json})
+
+    def delete(self, obj_id: str):
+        """ Journal the removal of an object
+        """
+        self._append({'op': 'delete', 'id': obj_id})
+
+    def write_batch(self, changes: dict):
+        """ Journal many changes with a single write and fsync
+
+        `changes` maps object ids to their new JSON, or to None for
+        removed objects.
+        """
+        records = [{'op': 'delete', 'id': obj_id} if obj_json is None else
+                   {'op': 'put', 'id': obj_id, 'obj': obj_json}
+                   for obj_id, obj_json in changes.items()]
+        self._append(*records, sync=True)
+
+    def _append(self, *records: dict, sync: bool = False):
+        """ Append records, fsync'ing when the group is complete
+        """
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a')
+            self._file.write(lines)
+            self._file.flush()
+            self._pending += len(records)
+            self._records += len(records)
+            if sync or self._pending >= self.group_size:
+                self._sync()
+            elif self.group_interval and self._timer is None:
+                self._timer = threading.Timer(self.group_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync(self):
+        """ Flush and fsync the journal, the lock must be held
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def sync(self):
+        """ Make every journaled record durable
+        """
+        with self._lock:
+            self._sync()
+
+    def needs_compaction(self) -> bool:
+        """ Tell whether the journal grew past the compaction threshold
+        (a hint, compact(if_needed=True) checks again under the lock)
+        """
+        compactor = self._compactor
+        return self._records >= self.compact_threshold and \
+            (compactor is None or not compactor.is_alive())
+
+    def compact(self, snapshot: Callable[[], dict], wait: bool = False,
+                if_needed: bool = False):
+        """ Replace the snapshot and start an empty journal
+
+        `snapshot` returns the objects JSON by id; it is called in a
+        background thread, after the current journal has been set aside,
+        so writes go on meanwhile into the new journal. One compaction
+        runs at a time: with `if_needed`, nothing is done if one is
+        running or the journal is below the threshold; otherwise the
+        running one is waited for first.
+        """
+        while True:
+            if not if_needed:
+                self.wait_compaction()
+            with self._lock:
+                compactor = self._compactor
+                if compactor is not None and compactor.is_alive():
+                    if if_needed:
+                        return
+                    continue
+                if if_needed and self._records < self.compact_threshold:
+                    return
+                self._rotate()
+                self._compactor = threading.Thread(
+                    target=self._write_snapshot, args=(snapshot,),
+                    daemon=True)
+                self._compactor.start()
+                break
+        if wait:
+            self.wait_compaction()
+
+    def _rotate(self):
+        """ Set the journal aside as the segment to compact, the lock
+        must be held
+
+        A segment left by a failed compaction isn't in the snapshot yet:
+        the journal is appended to it rather than replacing it.
+        """
+        self._sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.compacting_path):
+                with open(self.journal_path, 'rb') as src, \
+                        open(self.compacting_path, 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+        self._records = 0
+
+    def _store_snapshot(self, objs_json: dict):
+        """ Atomically replace the snapshot
+        """
+        directory, name = os.path.split(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp",
+                                        dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(objs_json, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _write_snapshot(self, snapshot: Callable[[], dict]):
+        """ Atomically write a new snapshot, then drop the old journal
+        """
+        self._store_snapshot(snapshot())
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def wait_compaction(self):
+        """ Wait for a running compaction to finish
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self):
+        """ Sync and close the journal
+        """
+        self.wait_compaction()
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
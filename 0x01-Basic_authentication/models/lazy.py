@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+""" Lazy module: compact records materialized into objects on access
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Iterator, Tuple
+import json
+import threading
+
+
+class LazyRecords(MutableMapping):
+    """ Objects of one model class kept as compact records, by id
+
+    Each object is held as its JSON encoded in a single bytes string,
+    about half the memory of an instance with its attribute values.
+    Reading an item builds the instance from its record; the `cache_size`
+    most recently used instances are kept, so hot objects are built once.
+    Assigning an object stores its record and caches it.
+    """
+
+    def __init__(self, factory: Callable, cache_size: int = 1024):
+        """ Initialize an empty mapping, building instances with factory
+        """
+        self._factory = factory
+        self.cache_size = cache_size
+        self._records = {}
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self.materialized = 0
+
+    @staticmethod
+    def _pack(obj_json: dict) -> bytes:
+        """ Return the record of an object JSON
+        """
+        return json.dumps(obj_json, separators=(',', ':')).encode()
+
+    @staticmethod
+    def _unpack(record: bytes, for_serialization: bool) -> dict:
+        """ Return the object JSON of a record
+        """
+        obj_json = json.loads(record)
+        if for_serialization:
+            return obj_json
+        return {k: v for k, v in obj_json.items() if k[0] != '_'}
+
+    def _cache_put(self, obj_id: str, obj):
+        """ Cache an instance as the most recently used one
+        """
+        self._cache[obj_id] = obj
+        self._cache.move_to_end(obj_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def put_json(self, obj_id: str, obj_json: dict):
+        """ Store an object from its JSON, without building it
+        """
+        with self._lock:
+            self._records[obj_id] = self._pack(obj_json)
+            self._cache.pop(obj_id, None)
+
+    def json(self, obj_id: str, for_serialization: bool = False) -> dict:
+        """ Return the JSON of a stored object, like to_json
+        """
+        return self._unpack(self._records[obj_id], for_serialization)
+
+    def json_items(self, for_serialization: bool = False) \
+            -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, JSON) of every object, building none
+        """
+        with self._lock:
+            records = list(self._records.items())
+        for obj_id, record in records:
+            yield obj_id, self._unpack(record, for_serialization)
+
+    def scan(self, attributes: dict) -> Iterator[str]:
+        """ Iterate over the ids of the objects whose JSON values
+        equal `attributes`, building none
+        """
+        # a record can only match if it contains every encoded string
+        needles = [self._pack(v) for v in attributes.values()
+                   if isinstance(v, str)]
+        with self._lock:
+            records = list(self._records.items())
+        for obj_id, record in records:
+            if not all(needle in record for needle in needles):
+                continue
+            obj_json = json.loads(record)
+            if all(k in obj_json and obj_json[k] == v
+                   for k, v in attributes.items()):
+                yield obj_id
+
+    def __getitem__(self, obj_id: str):
+        """ Return the instance of an object, building it if not cached
+        """
+        with self._lock:
+            obj = self._cache.get(obj_id)
+            if obj is None:
+                obj = self._factory(**json.loads(self._records[obj_id]))
+                self.materialized += 1
+            self._cache_put(obj_id, obj)
+            return obj
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store an object, caching its instance
+        """
+        with self._lock:
+            self._records[obj_id] = self._pack(obj.to_json(True))
+            self._cache_put(obj_id, obj)
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        with self._lock:
+            del self._records[obj_id]
+            self._cache.pop(obj_id, None)
+
+    def __contains__(self, obj_id) -> bool:
+        """ Tell whether an object is stored, without building it
+        """
+        return obj_id in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids
+        """
+        with self._lock:
+            return iter(list(self._records))
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._records)
+
+    def copy(self) -> dict:
+        """ Return a dict of every instance (builds them all)
+        """
+        return {obj_id: self[obj_id] for obj_id in self}
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+""" Query module: predicates, ordering and limits for Base.query
+"""
+from itertools import islice
+from operator import attrgetter
+from typing import Iterable, Iterator, Optional
+import heapq
+
+
+class Predicate():
+    """ Condition on the value of one attribute
+    """
+
+    def match(self, value) -> bool:
+        """ Tell whether an attribute value satisfies the condition
+        """
+        raise NotImplementedError
+
+    def values(self) -> Optional[list]:
+        """ Return the only values satisfying the condition, for a hash
+        index lookup, None if they can't be listed
+        """
+        return None
+
+    def bounds(self) -> Optional[tuple]:
+        """ Return (low, low_inclusive, high, high_inclusive) enclosing
+        the values satisfying the condition, for a sorted index scan,
+        None for no bound; None if there is no range
+        """
+        return None
+
+
+class Eq(Predicate):
+    """ Value equal to the given one: what a plain value in a query means
+    """
+
+    def __init__(self, value):
+        """ Initialize from the value to compare with
+        """
+        self.value = value
+
+    def match(self, value) -> bool:
+        """ Tell whether the value is equal
+        """
+        return value == self.value
+
+    def values(self) -> list:
+        """ Return the value
+        """
+        return [self.value]
+
+
+class In(Predicate):
+    """ Value equal to one of the given ones
+    """
+
+    def __init__(self, values: Iterable):
+        """ Initialize from the values to compare with
+        """
+        self._values = list(values)
+
+    def match(self, value) -> bool:
+        """ Tell whether the value is one of them
+        """
+        return value in self._values
+
+    def values(self) -> list:
+        """ Return the values
+        """
+        return self._values
+
+
+class Prefix(Predicate):
+    """ String value starting with the given prefix
+    """
+
+    def __init__(self, prefix: str):
+        """ Initialize from the prefix
+        """
+        self.prefix = prefix
+
+    def match(self, value) -> bool:
+        """ Tell whether the value is a string with the prefix
+        """
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+    def bounds(self) -> Optional[tuple]:
+        """ Return the range of the strings with the prefix: from the
+        prefix, up to the prefix with its last character incremented
+        """
+        if not self.prefix:
+            return None
+        last = ord(self.prefix[-1])
+        if last == 0x10FFFF:
+            return (self.prefix, True, None, False)
+        return (self.prefix, True, self.prefix[:-1] + chr(last + 1), False)
+
+
+class Range(Predicate):
+    """ Value within bounds: gt/gte below, lt/lte above, any of them
+    omitted for no bound on that side
+    """
+
+    def __init__(self, gt=None, gte=None, lt=None, lte=None):
+        """ Initialize from the bounds
+        """
+        self.low = gte if gt is None else gt
+        self.low_inclusive = gt is None
+        self.high = lte if lt is None else lt
+        self.high_inclusive = lt is None
+
+    def match(self, value) -> bool:
+        """ Tell whether the value is within the bounds
+        (None, or a value that doesn't compare with them, is not)
+        """
+        try:
+            if self.low is not None and (
+                    value < self.low or
+                    (value == self.low and not self.low_inclusive)):
+                return False
+            if self.high is not None and (
+                    value > self.high or
+                    (value == self.high and not self.high_inclusive)):
+                return False
+        except TypeError:
+            return False
+        return value is not None
+
+    def bounds(self) -> tuple:
+        """ Return the bounds
+        """
+        return (self.low, self.low_inclusive, self.high, self.high_inclusive)
+
+
+def predicates(where: dict) -> dict:
+    """ Return the predicate of each attribute of a query: plain values
+    mean equality
+    """
+    return {attr: cond if isinstance(cond, Predicate) else Eq(cond)
+            for attr, cond in where.items()}
+
+
+def sort_key(value) -> tuple:
+    """ Return a key ordering values of any type: None first, then
+    numbers, then strings, then anything else
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+def run_query(objs: Iterable, where: dict, order_by: str = None,
+              limit: int = None, offset: int = 0,
+              ordered: bool = False, after=None) -> Iterator:
+    """ Filter, order and slice objects lazily
+
+    `where` maps attributes to predicates; `order_by` is an attribute,
+    prefixed with '-' for descending order, and `ordered` tells that the
+    objects already come in that order. Unordered and pre-ordered
+    results stop reading objects once `limit` are found; otherwise only
+    the first offset + limit are kept while reading them all.
+    If not ordered, only the objects coming after the `after` object in
+    the order_by order (ties ordered by id) are kept.
+    """
+    matching = objs
+    if where:
+        matching = (obj for obj in objs
+                    if all(cond.match(getattr(obj, attr))
+                           for attr, cond in where.items()))
+    if after is not None and not ordered:
+        attr = order_by.lstrip('-')
+        cursor = (sort_key(getattr(after, attr)), after.id)
+        if order_by.startswith('-'):
+            matching = (obj for obj in matching
+                        if (sort_key(getattr(obj, attr)), obj.id) < cursor)
+        else:
+            matching = (obj for obj in matching
+                        if (sort_key(getattr(obj, attr)), obj.id) > cursor)
+    if order_by is not None and not ordered:
+        matching = iter(_order(list(matching), order_by, limit, offset))
+    stop = None if limit is None else offset + limit
+    return islice(matching, offset, stop)
+
+
+def _order(objs: list, order_by: str, limit: Optional[int],
+           offset: int) -> list:
+    """ Return objects sorted on an attribute then id, only the first
+    offset + limit ones if there is a limit
+    """
+    attr = order_by.lstrip('-')
+    reverse = order_by.startswith('-')
+    smallest = heapq.nlargest if reverse else heapq.nsmallest
+
+    def first(key):
+        """ Return the objects in key order, the first ones if limited
+        """
+        if limit is None:
+            return sorted(objs, key=key, reverse=reverse)
+        return smallest(offset + limit, objs, key=key)
+    try:
+        return first(attrgetter(attr, 'id'))
+    except TypeError:
+        # values that don't compare together (None and strings, say):
+        # rank them by type, slower so only done when needed
+        return first(lambda obj: (sort_key(getattr(obj, attr)), obj.id))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Reader-writer lock module
+"""
+import threading
+
+
+class _Holder():
+    """ Context manager acquiring one side of a lock
+    """
+
+    def __init__(self, acquire, release):
+        """ Initialize from the acquire and release methods
+        """
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        """ Acquire
+        """
+        self._acquire()
+
+    def __exit__(self, *exc_info):
+        """ Release
+        """
+        self._release()
+
+
+class RWLock():
+    """ Lock shared by any number of readers or held by one writer
+
+    Waiting writers go first: new readers queue behind them, so a steady
+    flow of reads can't starve writes. Both sides are reentrant, and the
+    writer may also read; a reader must not ask to write.
+
+    Use `with lock.read():` and `with lock.write():`.
+    """
+
+    def __init__(self):
+        """ Initialize a free lock
+        """
+        # taking the mutex itself is cheaper than entering the condition
+        self._mutex = threading.Lock()
+        self._cond = threading.Condition(self._mutex)
+        self._local = threading.local()
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._writers_waiting = 0
+        self._reading = _Holder(self.acquire_read, self.release_read)
+        self._writing = _Holder(self.acquire_write, self.release_write)
+
+    def read(self) -> _Holder:
+        """ Return a context manager holding the lock shared
+        """
+        return self._reading
+
+    def write(self) -> _Holder:
+        """ Return a context manager holding the lock exclusively
+        """
+        return self._writing
+
+    def acquire_read(self):
+        """ Wait until no writer holds nor waits for the lock, then share it
+        """
+        local = self._local
+        depth = getattr(local, 'reads', 0)
+        if depth == 0 and self._writer != threading.get_ident():
+            with self._mutex:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        local.reads = depth + 1
+
+    def release_read(self):
+        """ Stop sharing the lock
+        """
+        local = self._local
+        local.reads -= 1
+        if local.reads == 0 and self._writer != threading.get_ident():
+            with self._mutex:
+                self._readers -= 1
+                # only writers wait for the readers to leave
+                if self._readers == 0 and self._writers_waiting:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        """ Wait until no one else holds the lock, then hold it alone
+        """
+        me = threading.get_ident()
+        with self._mutex:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._writes += 1
+
+    def release_write(self):
+        """ Release the lock held alone
+        """
+        with self._mutex:
+            self._writes -= 1
+            if self._writes == 0:
+                self._writer = None
+                self._cond.notify_all()
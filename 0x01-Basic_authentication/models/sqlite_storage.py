@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+""" SQLite storage module: models shared by processes in one database
+"""
+from typing import Iterator, List, Optional, Tuple, TypeVar
+import json
+import os
+import re
+import sqlite3
+import threading
+from models.storage import Storage, matches
+
+
+# values that compare the same in SQLite and in Python
+SQL_TYPES = (str, int, float, bool, type(None))
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+class SQLiteStorage(Storage):
+    """ Objects of one model class in a table of a SQLite database
+
+    Each row holds the id and the to_json(True) of an object; attributes
+    of `model.indexed_attributes` get an index on their JSON value, so
+    equality searches on them don't scan the table. The database is in
+    WAL mode: readers never block the writer nor each other, so several
+    processes (e.g. gunicorn workers) can share it. Each thread of each
+    process uses its own connection.
+    """
+
+    def __init__(self, model: type, db_path: str = ".db.sqlite3",
+                 timeout: float = 30.0):
+        """ Initialize the backend of a model class on a database file
+        """
+        super().__init__(model)
+        self.db_path = db_path
+        self.timeout = timeout
+        self.table = '"{}"'.format(model.__name__)
+        self._local = threading.local()
+
+    @staticmethod
+    def _path(attribute: str) -> str:
+        """ Return the SQL expression of an attribute JSON value
+        """
+        return "json_extract(data, '$.{}')".format(attribute)
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Return the connection of the current thread and process
+        (a connection must not cross a fork)
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(
+                self.db_path, timeout=self.timeout, isolation_level=None)
+            local.pid = os.getpid()
+            self._setup(local.connection)
+        return local.connection
+
+    def _setup(self, connection: sqlite3.Connection):
+        """ Switch to WAL mode and create the table and its indexes
+        """
+        connection.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode, NORMAL only fsyncs at checkpoints and stays
+        # consistent: a power loss may drop the last commits only
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS {} "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL)".format(self.table))
+        for attr in self.model.indexed_attributes:
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS "{}_{}" ON {} ({})'.format(
+                    self.model.__name__, attr, self.table, self._path(attr)))
+
+    def load(self):
+        """ Nothing to load: every read queries the database
+        """
+        self._connection()
+
+    def _build(self, data: str) -> TypeVar('Base'):
+        """ Return the object of a row
+        """
+        return self.model(**json.loads(data))
+
+    def get(self, obj_id: str) -> Optional[TypeVar('Base')]:
+        """ Return one object by id, None if there is none
+        """
+        row = self._connection().execute(
+            "SELECT data FROM {} WHERE id = ?".format(self.table),
+            (obj_id,)).fetchone()
+        return None if row is None else self._build(row[0])
+
+    def search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects with all the attribute values
+
+        Scalar values are matched in SQL (through the index of indexed
+        attributes); the rows found are checked again in Python, so the
+        result is the same as the in-memory store's.
+        """
+        clauses = []
+        params = []
+        for k, v in attributes.items():
+            if type(v) in SQL_TYPES and IDENTIFIER.fullmatch(k):
+                clauses.append("{} IS ?".format(self._path(k)))
+                params.append(v)
+        query = "SELECT data FROM {}".format(self.table)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        objs = (self._build(data) for data, in
+                self._connection().execute(query, params))
+        return [obj for obj in objs if matches(obj, attributes)]
+
+    def put(self, obj: TypeVar('Base')):
+        """ Store (insert or replace) an object
+        """
+        self._connection().execute(
+            "INSERT INTO {} (id, data) VALUES (?, ?) ON CONFLICT (id) "
+            "DO UPDATE SET data = excluded.data".format(self.table),
+            (obj.id, json.dumps(obj.to_json(True))))
+
+    def delete(self, obj_id: str):
+        """ Remove an object by id, if it is stored
+        """
+        self._connection().execute(
+            "DELETE FROM {} WHERE id = ?".format(self.table), (obj_id,))
+
+    def count(self) -> int:
+        """ Return the number of objects
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM {}".format(self.table)).fetchone()[0]
+
+    def json_items(self, for_serialization: bool = False) \
+            -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, to_json()) of all objects, building none
+        """
+        cursor = self._connection().execute(
+            "SELECT id, data FROM {}".format(self.table))
+        for obj_id, data in cursor:
+            obj_json = json.loads(data)
+            if not for_serialization:
+                obj_json = {k: v for k, v in obj_json.items() if k[0] != '_'}
+            yield obj_id, obj_json
+
+    def close(self):
+        """ Close the connection of the current thread
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local = threading.local()
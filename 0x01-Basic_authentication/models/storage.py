@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+""" Storage module: interface of the model storage backends
+"""
+from typing import Iterator, List, Optional, Tuple, TypeVar
+from models.query import predicates, run_query
+
+
+def matches(obj, attributes: dict) -> bool:
+    """ Tell whether an object has all the attribute values
+    """
+    for k, v in attributes.items():
+        if (getattr(obj, k) != v):
+            return False
+    return True
+
+
+class Storage():
+    """ Storage backend of one model class
+
+    A backend stores the objects of `model` by id; Base delegates its
+    load_from_file, get, search, count, save and remove to it.
+    """
+
+    def __init__(self, model: type):
+        """ Initialize the backend of a model class
+        """
+        self.model = model
+
+    def load(self):
+        """ (Re)load the objects from the persistent store
+        """
+        raise NotImplementedError
+
+    def get(self, obj_id: str) -> Optional[TypeVar('Base')]:
+        """ Return one object by id, None if there is none
+        """
+        raise NotImplementedError
+
+    def search(self, attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects with all the attribute values
+        """
+        raise NotImplementedError
+
+    def query(self, where: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0,
+              after: str = None) -> Iterator:
+        """ Iterate over the objects matching predicates, see Base.query
+        """
+        cursor = None
+        if after is not None:
+            cursor = self.get(after)
+            if cursor is None:
+                raise ValueError("no object {} to start after".format(after))
+        return run_query(iter(self.search({})), predicates(where),
+                         order_by, limit, offset, after=cursor)
+
+    def put(self, obj: TypeVar('Base')):
+        """ Store (insert or replace) an object
+        """
+        raise NotImplementedError
+
+    def delete(self, obj_id: str):
+        """ Remove an object by id, if it is stored
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """ Return the number of objects
+        """
+        raise NotImplementedError
+
+    def refresh(self):
+        """ Pick up the changes other processes made to the store
+        """
+
+    def version(self) -> Optional[str]:
+        """ Return a tag that changes whenever the objects change, None if
+        the backend can't tell (another process may change them)
+        """
+        return None
+
+    def json_items(self, for_serialization: bool = False) \
+            -> Iterator[Tuple[str, dict]]:
+        """ Iterate over (id, to_json()) of all objects
+        """
+        for obj in self.search({}):
+            yield obj.id, obj.to_json(for_serialization)
+
+    def close(self):
+        """ Release the resources of the backend
+        """
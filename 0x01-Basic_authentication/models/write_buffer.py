@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+""" Write buffer module: coalesce model writes into fewer flushes
+"""
+from typing import Callable, Optional
+import threading
+
+
+class WriteBuffer():
+    """ Pending writes of one model class, by object id
+
+    A write is an object to persist, or None for a removal; writing the
+    same id twice keeps only the last one. Writes are buffered while a
+    batch is open, or at all times in deferred mode, where they are
+    flushed once `max_pending` objects are waiting or `max_delay` seconds
+    after the first pending write, whichever comes first.
+
+    A batch belongs to the thread that opened it: it only holds the
+    writes of that thread, flushed when its outermost batch closes.
+    """
+
+    def __init__(self, flush: Callable[[dict], None]):
+        """ Initialize an empty buffer flushing through `flush`
+        """
+        self._flush = flush
+        self._lock = threading.RLock()
+        # held while persisting, so flushes keep the order of the writes
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        # writes taken by the flush under way, not persisted yet
+        self._flushing = {}
+        # batch depth of each thread, and writes of its open batch
+        self._local = threading.local()
+        self._batches = {}
+        self._timer = None
+        self.max_delay = None
+        self.max_pending = None
+
+    @property
+    def buffering(self) -> bool:
+        """ Tell whether writes are currently buffered
+        """
+        return getattr(self._local, 'depth', 0) > 0 or \
+            self.max_delay is not None
+
+    def defer(self, max_delay: Optional[float], max_pending: int):
+        """ Switch deferred mode on, or off when max_delay is None
+        """
+        with self._lock:
+            self.max_delay = max_delay
+            self.max_pending = max_pending
+        if max_delay is None:
+            self.flush()
+
+    def add(self, obj_id: str, obj):
+        """ Buffer the write of one object, None to remove it
+        """
+        with self._lock:
+            batch = self._batches.get(threading.get_ident())
+            if batch is not None:
+                batch[obj_id] = obj
+                return
+            self._pending[obj_id] = obj
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def pending_ids(self) -> list:
+        """ Return the ids of the objects with a write pending, in a
+        batch of any thread or being flushed
+        """
+        with self._lock:
+            ids = list(self._flushing) + list(self._pending)
+            for batch in self._batches.values():
+                ids.extend(batch)
+            return ids
+
+    def begin(self):
+        """ Open a batch: buffer every write of the current thread until
+        the matching end()
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            with self._lock:
+                self._batches[threading.get_ident()] = {}
+        self._local.depth = depth + 1
+
+    def end(self):
+        """ Close a batch, flushing when the outermost one closes
+        """
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        with self._lock:
+            self._pending.update(self._batches.pop(threading.get_ident()))
+        self.flush()
+
+    def flush(self):
+        """ Persist every pending write now
+
+        The buffer lock is not held while persisting: persisting takes
+        the storage lock, and readers holding the storage lock may ask
+        for pending_ids. Until persisted, the writes are still reported
+        by pending_ids.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            try:
+                if pending:
+                    self._flush(pending)
+            except BaseException:
+                # not persisted: pending again, behind any newer write
+                with self._lock:
+                    for obj_id, obj in pending.items():
+                        self._pending.setdefault(obj_id, obj)
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
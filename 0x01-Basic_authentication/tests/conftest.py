@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+""" Shared fixtures of the tests
+"""
+from datetime import datetime, timedelta
+import base64
+import json
+import threading
+import pytest
+from models import base
+from models.user import User
+
+
+STORAGE_VARIABLES = ('STORAGE_BACKEND', 'STORAGE_FORMAT',
+                     'STORAGE_REFRESH_INTERVAL', 'STORAGE_SQLITE_PATH')
+
+
+def reset_storage():
+    """ Persist what is pending, then forget every object, backend,
+    journal and write buffer
+    """
+    base.close_storage()
+    for registry in (base.DATA, base.INDEXES, base.JOURNALS, base.BUFFERS,
+                     base.LAZY_CACHE_SIZES, base.STORAGES):
+        registry.clear()
+
+
+class FakeRequest():
+    """ Request with only an Authorization header
+    """
+
+    def __init__(self, authorization: str):
+        """ Initialize from the header
+        """
+        self.headers = {'Authorization': authorization}
+
+
+def basic(email: str, password: str) -> str:
+    """ Return a Basic Authorization header
+    """
+    token = base64.b64encode("{}:{}".format(email, password).encode())
+    return "Basic " + token.decode()
+
+
+def users_json(count: int, start: datetime = datetime(2024, 2, 23, 10)) \
+        -> list:
+    """ Return the JSON of count users: id <i>, email user<i>@hbtn.io,
+    created i seconds after start
+    """
+    users = []
+    for i in range(count):
+        stamp = (start + timedelta(seconds=i)).strftime(
+            base.TIMESTAMP_FORMAT)
+        users.append({"id": str(i), "email": "user{}@hbtn.io".format(i),
+                      "_password": "5e884898da28047151d0e56f8dc6292773603d0d",
+                      "first_name": "Bob", "last_name": "Dylan",
+                      "created_at": stamp, "updated_at": stamp})
+    return users
+
+
+def write_users(users: list, file_format: str = 'json'):
+    """ Write users JSON as the User store file of the current directory,
+    in the given STORAGE_FORMAT
+    """
+    if file_format == 'jsonl':
+        with open(".db_User.jsonl", "w") as f:
+            for user_json in users:
+                f.write(json.dumps(user_json) + "\n")
+    else:
+        with open(".db_User.json", "w") as f:
+            json.dump({user_json["id"]: user_json for user_json in users}, f)
+
+
+def run_threads(*targets, timeout: float = 30.0):
+    """ Run functions in threads, fail if one is still running after
+    timeout seconds (a deadlock)
+    """
+    threads = [threading.Thread(target=target, daemon=True)
+               for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+        assert not thread.is_alive(), "deadlock"
+
+
+@pytest.fixture
+def thread_errors(monkeypatch):
+    """ Collect the exceptions raised in threads
+    """
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook',
+                        lambda args: errors.append(args.exc_value))
+    return errors
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """ Run a test in an empty directory, with fresh model storage
+    """
+    monkeypatch.chdir(tmp_path)
+    for name in STORAGE_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+    reset_storage()
+    yield tmp_path
+    reset_storage()
+
+
+@pytest.fixture
+def bob(store):
+    """ A saved User
+    """
+    User.load_from_file()
+    user = User(email="bob@hbtn.io")
+    user.password = "H0lberton"
+    user.save()
+    return user
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Tests of the paths exempted from authentication
+"""
+import fnmatch
+import pytest
+
+pytest.importorskip("flask")
+from api.v1.auth.auth import Auth, PathMatcher  # noqa: E402
+
+
+PATTERNS = ["/api/v1/status/", "/api/v1/stat*", "/api/v1/users/[ab]?",
+            "/api/v1/open/*"]
+
+
+@pytest.mark.parametrize("path, required", [
+    ("/api/v1/status", False), ("/api/v1/status/", False),
+    ("/api/v1/stats", False), ("/api/v1/users/a1", False),
+    ("/api/v1/users/c1", True), ("/api/v1/users", True),
+    ("/api/v1/open/x/y", False), ("/api/v1/open", True), (None, True)])
+def test_require_auth(path, required):
+    """ Compiled or listed, the patterns exempt the paths fnmatch
+    matches, trailing slashes aside
+    """
+    auth = Auth()
+    assert auth.require_auth(path, PATTERNS) is required
+    assert auth.require_auth(path, PathMatcher(PATTERNS)) is required
+    if path is not None:
+        assert required is not any(
+            fnmatch.fnmatch(path.rstrip('/'), pattern.rstrip('/'))
+            for pattern in PATTERNS)
+
+
+def test_require_auth_without_exclusions():
+    """ Every path needs authentication when none is excluded
+    """
+    assert Auth().require_auth("/api/v1/status", None)
+    assert Auth().require_auth("/api/v1/status", [])
+    assert Auth().require_auth("/api/v1/status", PathMatcher([]))
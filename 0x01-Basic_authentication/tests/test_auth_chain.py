@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+""" Tests of the authentication chain
+"""
+import importlib
+import pytest
+
+pytest.importorskip("flask")
+from api.v1.auth.auth import Auth  # noqa: E402
+from api.v1.auth.auth_chain import AuthChain  # noqa: E402
+from api.v1.auth.basic_auth import BasicAuth  # noqa: E402
+from tests.conftest import FakeRequest, basic  # noqa: E402
+
+
+@pytest.mark.parametrize("schemes", [(Auth, BasicAuth), (BasicAuth, Auth)])
+def test_chain_reaches_basic_auth(bob, schemes):
+    """ The base Auth, wherever it is in the chain, claims no request
+    """
+    chain = AuthChain([scheme() for scheme in schemes])
+    request = FakeRequest(basic("bob@hbtn.io", "H0lberton"))
+    assert chain.can_handle(request)
+    assert chain.current_user(request) is bob
+    assert not chain.can_handle(FakeRequest("Bearer token"))
+    assert chain.current_user(FakeRequest("Bearer token")) is None
+
+
+@pytest.mark.parametrize("auth_type, status", [
+    ("auth", 403), ("basic_auth", 200), ("auth,basic_auth", 200),
+    ("basic_auth,auth", 200)])
+def test_app_auth_types(bob, monkeypatch, auth_type, status):
+    """ Valid Basic credentials pass whenever basic_auth is configured
+    """
+    monkeypatch.setenv('AUTH_TYPE', auth_type)
+    import api.v1.app
+    app = importlib.reload(api.v1.app).app
+    client = app.test_client()
+    assert client.get('/api/v1/users/me').status_code == 401
+    assert client.get('/api/v1/users/me', headers={
+        'Authorization': "Bearer token"}).status_code == 403
+    response = client.get('/api/v1/users/me', headers={
+        'Authorization': basic("bob@hbtn.io", "H0lberton")})
+    assert response.status_code == status
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Tests of Basic authentication and its cache of verified credentials
+"""
+import pytest
+
+pytest.importorskip("flask")
+from api.v1.auth.basic_auth import BasicAuth, CredentialCache  # noqa: E402
+from tests.conftest import FakeRequest, basic  # noqa: E402
+
+
+@pytest.mark.parametrize("cache", [CredentialCache(0), CredentialCache()])
+def test_current_user(bob, cache):
+    """ Valid credentials give their user, with or without the cache,
+    and wrong ones never do
+    """
+    auth = BasicAuth(cache)
+    request = FakeRequest(basic("bob@hbtn.io", "H0lberton"))
+    for _ in range(3):
+        assert auth.current_user(request) is bob
+    for header in (basic("bob@hbtn.io", "nope"), basic("eve@hbtn.io", "x"),
+                   "Basic !!!", "Bearer token"):
+        assert auth.current_user(FakeRequest(header)) is None
+
+
+def test_cache_forgets_changed_users(bob):
+    """ A cached header stops authenticating once its user changes
+    password or is removed
+    """
+    auth = BasicAuth(CredentialCache())
+    request = FakeRequest(basic("bob@hbtn.io", "H0lberton"))
+    assert auth.current_user(request) is bob
+    bob.password = "n3w"
+    bob.save()
+    assert auth.current_user(request) is None
+    request = FakeRequest(basic("bob@hbtn.io", "n3w"))
+    assert auth.current_user(request) is bob
+    bob.remove()
+    assert auth.current_user(request) is None
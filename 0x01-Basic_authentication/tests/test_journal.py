@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Tests of the append-only journal
+"""
+import os
+from models.journal import Journal
+from models.user import User
+from tests.conftest import run_threads
+
+
+def test_concurrent_saves_with_compactions(store, thread_errors):
+    """ Writers crossing the compaction threshold together start one
+    compaction at a time, and no record is lost
+    """
+    User.use_journal(compact_threshold=20)
+    User.load_from_file()
+    saved = []
+
+    def writer():
+        for i in range(300):
+            user = User(email="user{}@hbtn.io".format(i))
+            user.save()
+            saved.append(user.id)
+
+    run_threads(*[writer] * 8)
+    assert thread_errors == []
+    User._journal().close()
+    journal = Journal(".db_User.json")
+    assert sorted(journal.load()) == sorted(saved)
+    assert not os.path.exists(journal.compacting_path)
+
+
+def test_failed_compaction_keeps_its_segment(store, monkeypatch,
+                                             thread_errors):
+    """ A segment whose snapshot failed is not overwritten by the next
+    compaction: after a crash, the records of both are loaded
+    """
+    def crash(objs_json):
+        raise OSError("disk full")
+    journal = Journal(".db_User.json")
+    journal.load()
+    monkeypatch.setattr(journal, '_store_snapshot', crash)
+    journal.put('a', {'id': 'a'})
+    journal.compact(dict, wait=True)
+    journal.put('b', {'id': 'b'})
+    journal.compact(dict, wait=True)
+    journal.close()
+    assert len(thread_errors) == 2
+    assert Journal(".db_User.json").load() == {'a': {'id': 'a'},
+                                               'b': {'id': 'b'}}
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Tests of lazy loading
+"""
+import pytest
+from models import base
+from models.user import User
+from tests.conftest import reset_storage, users_json, write_users
+
+
+@pytest.mark.parametrize('file_format', ['json', 'jsonl'])
+def test_lazy_answers_like_eager(store, monkeypatch, file_format):
+    """ Lazily loaded users answer reads as eagerly loaded ones do,
+    building only the users returned
+    """
+    monkeypatch.setenv('STORAGE_FORMAT', file_format)
+    write_users(users_json(100), file_format)
+
+    def answers() -> tuple:
+        """ Return what the reads give
+        """
+        return (User.count(), User.get('42').to_json(),
+                [user.id for user in User.search({'email': "user7@hbtn.io"})],
+                sorted(User.all_json(), key=lambda user: user['id']))
+
+    User.load_from_file()
+    eager = answers()
+    reset_storage()
+    monkeypatch.setenv('STORAGE_LAZY_CACHE', '8')
+    User.load_from_file()
+    assert base.DATA['User'].materialized == 0
+    assert answers() == eager
+    # count and all_json read the records: only get and search build
+    assert base.DATA['User'].materialized == 2
+
+
+def test_lazy_cache_is_bounded(store):
+    """ Only the most recently used instances are kept
+    """
+    write_users(users_json(50))
+    User.use_lazy_loading(cache_size=4)
+    User.load_from_file()
+    for i in range(50):
+        assert User.get(str(i)).email == "user{}@hbtn.io".format(i)
+    records = base.DATA['User']
+    assert records.materialized == 50
+    assert User.get('49') is User.get('49')
+    assert records.materialized == 50
+    User.get('0')
+    assert records.materialized == 51
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Tests of queries served by the sorted index
+"""
+from datetime import datetime
+import random
+import pytest
+from models.query import Range
+from models.storage import Storage
+from models.user import User
+from tests.conftest import users_json, write_users
+
+
+SECOND = datetime(2024, 1, 1, 10, 0, 0)
+
+
+@pytest.fixture
+def same_second(store):
+    """ Users created within one second, in the opposite order of
+    their ids
+    """
+    User.load_from_file()
+    for i, obj_id in enumerate('edcba'):
+        user = User(id=obj_id, email="{}@hbtn.io".format(obj_id))
+        user.created_at = SECOND.replace(microsecond=100 * i)
+        user.save()
+    return store
+
+
+def ids(users) -> list:
+    """ Return the ids of users
+    """
+    return [user.id for user in users]
+
+
+@pytest.mark.parametrize('query', [
+    {'order_by': 'created_at'},
+    {'order_by': '-created_at'},
+    {'order_by': 'created_at', 'after': 'd'},
+    {'order_by': '-created_at', 'after': 'b', 'limit': 2},
+    {'where': {'created_at': Range(gte=SECOND.replace(microsecond=100),
+                                   lt=SECOND.replace(microsecond=400))}},
+    {'where': {'created_at': Range(gt=SECOND)}, 'order_by': 'created_at'},
+])
+def test_index_orders_like_the_fallback(same_second, query):
+    """ The sorted index orders same-second users by microseconds, as
+    queries without an index do, in memory and reloaded from the file
+    """
+    expected = ids(Storage.query(User._storage(), **query))
+    assert ids(User.query(**query)) == expected
+    User.load_from_file()
+    reloaded = ids(Storage.query(User._storage(), **query))
+    assert ids(User.query(**query)) == reloaded
+
+
+def test_index_orders_by_microseconds(same_second):
+    """ Same-second users come in creation order, not id order
+    """
+    assert ids(User.query(order_by='created_at')) == list('edcba')
+    assert ids(User.query(order_by='-created_at', limit=2)) == ['a', 'b']
+
+
+def test_index_of_an_unordered_file(store):
+    """ Users saved out of creation order are read in created_at order,
+    by ranges and pages
+    """
+    users = users_json(500)
+    random.Random(0).shuffle(users)
+    write_users(users)
+    User.load_from_file()
+    by_age = sorted(users, key=lambda user: user['created_at'])
+    expected = [user['id'] for user in by_age]
+    assert ids(User.query(order_by='created_at')) == expected
+    assert ids(User.query(order_by='-created_at', limit=20)) == \
+        expected[::-1][:20]
+    assert ids(User.query(order_by='created_at', limit=20,
+                          after=expected[99])) == expected[100:120]
+    low = User.get(expected[10]).created_at
+    high = User.get(expected[30]).created_at
+    assert ids(User.query({'created_at': Range(gt=low, lte=high)},
+                          order_by='created_at')) == expected[11:31]
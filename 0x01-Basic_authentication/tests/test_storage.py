@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+""" Tests of the JSON store shared by threads
+"""
+import multiprocessing
+import random
+import pytest
+from models.base import JsonStorage
+from models.sqlite_storage import SQLiteStorage
+from models.user import User
+from tests.conftest import reset_storage, run_threads, users_json, \
+    write_users
+
+
+def test_coherent_reads_during_deferred_flushes(store):
+    """ Readers refreshing the store while deferred writes are flushed
+    don't deadlock, and every write lands in the file
+    """
+    User.use_storage(JsonStorage(User, refresh_interval=0.0))
+    User.load_from_file()
+    User.defer_writes(max_delay=0.001, max_pending=5)
+    saved = []
+
+    def writer():
+        for i in range(300):
+            user = User(email="user{}@hbtn.io".format(i))
+            user.save()
+            saved.append(user.id)
+        User.flush()
+
+    def reader():
+        for _ in range(2000):
+            User.count()
+            User.search({'email': "user0@hbtn.io"})
+
+    run_threads(writer, reader, reader)
+    User.defer_writes(None)
+    User.load_from_file()
+    assert sorted(user.id for user in User.all()) == sorted(saved)
+
+
+@pytest.mark.parametrize('file_format', ['json', 'jsonl'])
+def test_load_formats(store, monkeypatch, file_format):
+    """ Both file formats load every user as it was written
+    """
+    users = users_json(50)
+    write_users(users, file_format)
+    monkeypatch.setenv('STORAGE_FORMAT', file_format)
+    User.load_from_file()
+    assert User.count() == len(users)
+    for user_json in users:
+        assert User.get(user_json['id']).to_json(True) == user_json
+
+
+def test_indexed_search_follows_saves(store):
+    """ A search on the email index finds what a scan of every user
+    finds, as users are loaded, changed and removed
+    """
+    write_users(users_json(200))
+    User.load_from_file()
+
+    def scan(email: str) -> list:
+        """ Return the ids of the users with an email, read one by one
+        """
+        return [user.id for user in User.all() if user.email == email]
+
+    for i in range(0, 200, 7):
+        email = "user{}@hbtn.io".format(i)
+        assert [user.id for user in User.search({'email': email})] == \
+            scan(email) == [str(i)]
+    user = User.get('3')
+    user.email = "bob@hbtn.io"
+    user.save()
+    assert User.search({'email': "user3@hbtn.io"}) == []
+    assert User.search({'email': "bob@hbtn.io"}) == [user]
+    user.remove()
+    assert User.search({'email': "bob@hbtn.io"}) == []
+
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_batched_saves_are_persisted(store, journal):
+    """ Saves coalesced by a batch all reach the file when it exits
+    """
+    if journal:
+        User.use_journal()
+    User.load_from_file()
+    with User.batch():
+        users = [User(email="user{}@hbtn.io".format(i)) for i in range(100)]
+        for user in users:
+            user.save()
+        assert User.count() == len(users)
+    reset_storage()
+    if journal:
+        User.use_journal()
+    User.load_from_file()
+    assert sorted(user.id for user in User.all()) == \
+        sorted(user.id for user in users)
+
+
+def test_concurrent_operations(store, thread_errors):
+    """ Threads reading, saving and removing users with deferred writes
+    leave the store, its index and the file in agreement
+    """
+    users = users_json(100)
+    write_users(users)
+    User.load_from_file()
+    User.defer_writes(0.01)
+
+    def worker():
+        """ Run random operations: 80% reads, 10% saves, 5% users
+        removed right away, 5% listings
+        """
+        rand = random.Random()
+        for i in range(300):
+            roll = rand.random()
+            if roll < 0.4:
+                User.get(str(rand.randrange(len(users))))
+            elif roll < 0.8:
+                User.search({'email': "user{}@hbtn.io".format(
+                    rand.randrange(len(users)))})
+            elif roll < 0.9:
+                user = User.get(str(rand.randrange(len(users))))
+                user.first_name = "Bob{}".format(i)
+                user.save()
+            elif roll < 0.95:
+                user = User(email="tmp{}@hbtn.io".format(rand.random()))
+                user.save()
+                user.remove()
+            else:
+                User.all_json()
+
+    run_threads(*[worker] * 4)
+    assert thread_errors == []
+    User.flush()
+    assert User.count() == len(users)
+    for user_json in users:
+        assert [user.id for user in User.search(
+            {'email': user_json['email']})] == [user_json['id']]
+    User.defer_writes(None)
+    User.load_from_file()
+    assert User.count() == len(users)
+
+
+def rename(user_id: str):
+    """ Change one user from another process
+    """
+    User.use_storage(JsonStorage(User, refresh_interval=0))
+    User.load_from_file()
+    user = User.get(user_id)
+    user.last_name = "Marley"
+    user.save()
+
+
+@pytest.mark.parametrize('file_format', ['json', 'jsonl'])
+def test_refresh_sees_other_processes(store, monkeypatch, file_format):
+    """ A coherent store picks up the users another process saved
+    """
+    monkeypatch.setenv('STORAGE_FORMAT', file_format)
+    write_users(users_json(20), file_format)
+    User.use_storage(JsonStorage(User, refresh_interval=0))
+    User.load_from_file()
+    process = multiprocessing.get_context('fork').Process(
+        target=rename, args=('7',))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert User.get('7').last_name == "Marley"
+    assert User.get('8').last_name == "Dylan"
+    assert User.count() == 20
+
+
+@pytest.mark.parametrize('backend', [JsonStorage, SQLiteStorage])
+def test_backends_persist(store, backend):
+    """ Every backend reloads the users saved, and searches them
+    """
+    User.use_storage(backend(User))
+    User.load_from_file()
+    with User.batch():
+        users = [User(email="user{}@hbtn.io".format(i)) for i in range(20)]
+        for user in users:
+            user.save()
+    reset_storage()
+    User.use_storage(backend(User))
+    User.load_from_file()
+    assert User.count() == len(users)
+    for user in users:
+        assert User.get(user.id).email == user.email
+        assert [found.id for found in User.search(
+            {'email': user.email})] == [user.id]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+""" Tests of the User model
+"""
+from datetime import datetime
+from models.user import User
+from tests.conftest import users_json
+
+
+def test_to_json_round_trip():
+    """ The JSON of a user rebuilds the same user; the password hash is
+    only serialized for storage
+    """
+    user_json = users_json(1)[0]
+    user = User(**user_json)
+    assert not hasattr(user, '__dict__')
+    assert user.to_json(True) == user_json
+    public = dict(user_json)
+    del public['_password']
+    assert user.to_json() == public
+    assert User(**user.to_json(True)).to_json(True) == user_json
+
+
+def test_to_json_of_unset_attributes():
+    """ Timestamps are written to the second, and attributes that were
+    never assigned are left out
+    """
+    user = User(email="bob@hbtn.io")
+    user.created_at = datetime(2024, 2, 23, 10, 0, 0, 123456)
+    assert user.to_json()['created_at'] == "2024-02-23T10:00:00"
+    del user.first_name
+    assert 'first_name' not in user.to_json()
+    assert user.to_json()['email'] == "bob@hbtn.io"
+
+
+def test_subclass_attributes_outside_slots():
+    """ Attributes of a subclass without __slots__ are serialized too
+    """
+    class Admin(User):
+        """ User with extra attributes
+        """
+
+    admin = Admin(email="root@hbtn.io")
+    admin.level = 3
+    admin._token = "secret"
+    assert admin.to_json()['level'] == 3
+    assert '_token' not in admin.to_json()
+    assert admin.to_json(True)['_token'] == "secret"
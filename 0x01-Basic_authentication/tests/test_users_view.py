@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+""" Tests of the GET /api/v1/users views
+"""
+import importlib
+import json
+import pytest
+
+pytest.importorskip("flask")
+from api.v1.views.cache import RESPONSES  # noqa: E402
+from models.user import User  # noqa: E402
+from tests.conftest import users_json, write_users  # noqa: E402
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    """ A test client of the app without authentication, over 300
+    users
+    """
+    write_users(users_json(300))
+    User.load_from_file()
+    monkeypatch.setenv('AUTH_TYPE', 'none')
+    import api.v1.app
+    RESPONSES.clear()
+    yield importlib.reload(api.v1.app).app.test_client()
+    RESPONSES.clear()
+
+
+def public(users: list) -> list:
+    """ Return the JSON of users without their password
+    """
+    return [{k: v for k, v in user.items() if k[0] != '_'} for user in users]
+
+
+def test_list_all_users(client):
+    """ The streamed list and NDJSON give every user
+    """
+    expected = sorted(public(users_json(300)), key=lambda user: user['id'])
+    response = client.get('/api/v1/users')
+    assert response.status_code == 200
+    assert sorted(response.get_json(), key=lambda u: u['id']) == expected
+    response = client.get('/api/v1/users?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert sorted(map(json.loads, lines), key=lambda u: u['id']) == expected
+
+
+def test_pages_follow_links(client):
+    """ Following the Link headers pages through every user, in
+    created_at order
+    """
+    url = '/api/v1/users?limit=70'
+    seen = []
+    while url is not None:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 70
+        seen.extend(page)
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    assert seen == public(users_json(300))
+    assert client.get('/api/v1/users?limit=0').status_code == 400
+    assert client.get('/api/v1/users?after=nobody').status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/v1/users/3', '/api/v1/users?limit=5',
+                                 '/api/v1/users'])
+def test_cached_responses(client, url):
+    """ Cached and revalidated responses carry what a fresh one does,
+    until a user changes
+    """
+    RESPONSES.max_entries = 0
+    try:
+        fresh = client.get(url)
+    finally:
+        RESPONSES.max_entries = 1024
+    etag = fresh.headers['ETag']
+    for _ in range(2):
+        response = client.get(url)
+        assert response.get_data() == fresh.get_data()
+        assert response.headers['ETag'] == etag
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    user = User.get('3')
+    user.first_name = "Robert"
+    user.save()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_data() != fresh.get_data()
+
+
+def test_one_user(client):
+    """ GET of a user by id, 404 for an unknown id
+    """
+    response = client.get('/api/v1/users/7')
+    assert response.get_json() == public(users_json(8))[7]
+    assert client.get('/api/v1/users/nobody').status_code == 404
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" Tests of the write buffer
+"""
+import json
+import threading
+import pytest
+from models.user import User
+from models.write_buffer import WriteBuffer
+from tests.conftest import run_threads
+
+
+def saved_ids() -> set:
+    """ Return the ids in the User file
+    """
+    with open(".db_User.json") as f:
+        return set(json.load(f))
+
+
+def test_batch_only_buffers_its_thread(store, thread_errors):
+    """ A batch open in one thread doesn't hold the saves of another
+    """
+    User.load_from_file()
+    opened = threading.Event()
+    checked = threading.Event()
+    batched = User(email="batched@hbtn.io")
+    direct = User(email="direct@hbtn.io")
+
+    def batching():
+        with User.batch():
+            batched.save()
+            opened.set()
+            checked.wait()
+
+    def saving():
+        opened.wait()
+        try:
+            direct.save()
+            # persisted at once, not held until the other thread's batch
+            assert direct.id in saved_ids()
+            assert User._buffer().pending_ids() == [batched.id]
+        finally:
+            checked.set()
+
+    run_threads(batching, saving)
+    assert thread_errors == []
+    assert saved_ids() == {direct.id, batched.id}
+
+
+def test_failed_flush_keeps_the_writes():
+    """ Writes a flush failed to persist stay pending, behind newer ones
+    """
+    flushed = []
+    failing = [True]
+
+    def flush(pending):
+        if failing[0]:
+            raise OSError("disk full")
+        flushed.append(pending)
+    buffer = WriteBuffer(flush)
+    buffer.begin()
+    buffer.add('a', 1)
+    buffer.add('b', 2)
+    with pytest.raises(OSError):
+        buffer.end()
+    assert sorted(buffer.pending_ids()) == ['a', 'b']
+    buffer.begin()
+    buffer.add('a', 3)
+    failing[0] = False
+    buffer.end()
+    assert flushed == [{'a': 3, 'b': 2}]
+    assert buffer.pending_ids() == []
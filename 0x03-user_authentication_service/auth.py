@@ -1,23 +1,122 @@
 #!/usr/bin/env python3
 """Password Hashing"""
 import bcrypt
+from bisect import bisect_left
 from db import DB
+from functools import lru_cache
+from typing import Dict
 from user import User
 from sqlalchemy.orm.exc import NoResultFound
+import threading
+import time
 import uuid
 
 
-def _hash_password(password: str) -> str:
+DEFAULT_ROUNDS = 12
+# calibration never lowers the cost below the bcrypt default
+MIN_ROUNDS = DEFAULT_ROUNDS
+MAX_ROUNDS = 16
+
+
+class LatencyHistogram:
+    """
+    Thread-safe histogram of operation latencies in fixed buckets.
+    """
+
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self):
+        """
+        Initializes an empty histogram.
+        """
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Records one latency.
+
+        Args:
+            seconds: A float representing the latency in seconds.
+        """
+        index = bisect_left(self.BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the bucket counts.
+
+        Returns:
+            A dict mapping each "<=N ms" bucket, then ">N ms", to the
+            number of latencies that fell in it.
+        """
+        with self._lock:
+            counts = list(self._counts)
+        labels = ["<={}ms".format(b) for b in self.BUCKETS_MS]
+        labels.append(">{}ms".format(self.BUCKETS_MS[-1]))
+        return dict(zip(labels, counts))
+
+
+def _hash_password(password: str, rounds: int = DEFAULT_ROUNDS) -> str:
     """
     Hashes the input password using bcrypt.
 
     Args:
         password: A string representing the password to be hashed.
+        rounds: An integer representing the bcrypt work factor.
 
     Returns:
         A string representing the salted hash of the input password.
     """
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+@lru_cache(maxsize=None)
+def _calibrate_rounds(target: float) -> int:
+    """
+    Picks the highest bcrypt cost whose hashing time meets a target.
+
+    Each extra round doubles the hashing time, so the cost is raised one
+    round at a time until a hash takes longer than the target. The result
+    is cached, so the measurement runs once per process.
+
+    Args:
+        target: A float representing the verify latency budget in seconds.
+
+    Returns:
+        An integer representing the work factor, between MIN_ROUNDS and
+        MAX_ROUNDS.
+    """
+    rounds = MIN_ROUNDS
+    while rounds < MAX_ROUNDS:
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds + 1))
+        if time.perf_counter() - start > target:
+            break
+        rounds += 1
+    return rounds
+
+
+def _hash_rounds(hashed_password: str) -> int:
+    """
+    Reads the work factor a bcrypt hash was made with.
+
+    Args:
+        hashed_password: A string representing a bcrypt hash.
+
+    Returns:
+        An integer representing the work factor, or 0 if the hash cannot
+        be parsed.
+    """
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
 
 
 def _generate_uuid() -> str:
@@ -35,11 +134,17 @@ class Auth:
     Auth class to interact with the authentication database.
     """
 
-    def __init__(self):
+    def __init__(self, target_latency: float = 0.25):
         """
         Initializes an instance of the Auth class.
+
+        Args:
+            target_latency: A float representing the password verification
+            budget in seconds, used to calibrate the bcrypt cost.
         """
         self._db = DB()
+        self._rounds = _calibrate_rounds(target_latency)
+        self.verify_timings = LatencyHistogram()
 
     def register_user(self, email: str, password: str) -> User:
         """
@@ -57,7 +162,7 @@ class Auth:
             if user:
                 raise ValueError('User {} already exists'.format(email))
         except NoResultFound:
-            hpassword = _hash_password(password)
+            hpassword = _hash_password(password, self._rounds)
             user = self._db.add_user(email, hpassword)
             return user
 
@@ -75,13 +180,36 @@ class Auth:
         try:
             user = self._db.find_user_by(email=email)
             if user:
-                return bcrypt.checkpw(
+                start = time.perf_counter()
+                valid = bcrypt.checkpw(
                         password.encode(),
                         user.hashed_password.encode()
                         )
+                self.verify_timings.observe(time.perf_counter() - start)
+                if valid:
+                    self._rehash_if_needed(user, password)
+                return valid
         except NoResultFound:
             return False
 
+    def _rehash_if_needed(self, user: User, password: str) -> None:
+        """
+        Re-hashes a just verified password at the calibrated cost.
+
+        Stored hashes made with a lower work factor are replaced on the
+        user's next successful login, so they converge to the current cost;
+        a hash is never rehashed down to a lower cost.
+
+        Args:
+            user: The User whose password was just verified.
+            password: A string representing the verified password.
+        """
+        if _hash_rounds(user.hashed_password) < self._rounds:
+            self._db.update_user(
+                    user.id,
+                    hashed_password=_hash_password(password, self._rounds)
+                    )
+
     def create_session(self, email: str) -> str:
         """
         Creates a session for the user with the provided email.
@@ -159,7 +287,7 @@ class Auth:
         """
         try:
             user = self._db.find_user_by(reset_token=reset_token)
-            new_password = _hash_password(password)
+            new_password = _hash_password(password, self._rounds)
             self._db.update_user(
                     user.id,
                     hashed_password=new_password,